@@ -1,15 +1,24 @@
 from src.database.chroma_search_functions import close_chroma_db_connection
-from src.data_processing.cache_functions import redis_client, redis_connected
-from data.process_data import embed_and_store_documents, split_documents
+from src.data_processing.cache_functions import get_redis_client, get_cache_stats, invalidate_cache
+from src.data_processing.answer_cache import invalidate_answers, get_answer_cache_stats
+from data.process_data import ingest_file
 from werkzeug.utils import secure_filename
-from flask import Flask, request, jsonify
-from src.main_reasoning import reasoning
+from flask import Flask, Response, request, jsonify, stream_with_context
+from src.main_reasoning import reasoning, reasoning_batch
 from flask_cors import CORS
-from langchain.schema.document import Document
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.vectorstores import Chroma
-from src.data_processing.get_embeddings import get_embeddings
+from src.data_processing.ingestion_jobs import ingestion_queue, QueueFullError
+from src.database.chroma_handles import handle_pool
+from src.database.collection_manifest import CollectionManifest, file_fingerprint
+from src.database.candidate_index import get_candidate_index, RECALL_PRESETS, SEARCH_MAX_TOP_K, SEARCH_MAX_EF
+from src.data_processing.get_embeddings import embed_query, EMBEDDING_MODEL_NAME
+from src.models.model_registry import registry
+from src.models.rerankers import get_reranker
+from src.prompts.prompts import PROMPT_TEMPLATE, INTERVIEW_QUESTIONS_PROMPT
+from src.data_processing.resume_insights import get_insights
+from src.data_processing.resume_chunker import SECTIONS
+import threading
 import shutil
+import json
 import time
 import os
 import sys
@@ -29,54 +38,121 @@ logger = logging.getLogger(__name__)
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'data', 'raw')
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-# Ensure the upload folder exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
 # Define a unique ChromaDB path based on timestamp
 CHROMA_BASE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'processed', 'chroma')
-os.makedirs(CHROMA_BASE_PATH, exist_ok=True)
-
-# Clear and recreate the test directory for loaded documents
-TEST_DIR = os.path.join(os.path.dirname(__file__), 'data', 'test')
-if os.path.exists(TEST_DIR):
-    shutil.rmtree(TEST_DIR)
-os.makedirs(TEST_DIR, exist_ok=True)
-
-# Global variable to track the current ChromaDB path
-CURRENT_CHROMA_PATH = os.path.join(CHROMA_BASE_PATH, 'default')
-os.makedirs(CURRENT_CHROMA_PATH, exist_ok=True)
-
-logger.info(f"Redis Connected: {redis_connected}")
-logger.info(f"Using ChromaDB path: {CURRENT_CHROMA_PATH}")
-
-PROMPT_TEMPLATE = """
-Answer this question in a clear, unboring matter, based on the following context:
-{context}
------
-Answer this question based on the above context, without citing the context in your answer:
-{question};/
-Answer:
-"""
-
-INTERVIEW_QUESTIONS_PROMPT = """
-Generate 5 specific and detailed interview questions based on the candidate's resume information in the context.
-Focus on their skills, experience, education, and projects to create questions that an interviewer might actually ask them.
-Format the response as a numbered list of questions (1., 2., etc.).
-Make the questions challenging but fair, probing for detailed responses about their experience.
-Make sure to reference specific items from their resume instead of asking generic questions.
------
-Context from resume:
-{context}
------
-Generate 5 interview questions based on this resume:
-"""
-
-def stream_response(response_text):
-    """Stream the response one character at a time to simulate typing."""
-    delay = 0.0001  # Adjust this delay to control the typing speed
-    for char in response_text:
-        yield char
-        time.sleep(delay)
+
+# Every resume lives in its own collection under CHROMA_BASE_PATH/<collection_id>.
+# Clients pass the collection_id returned by /upload; requests without one fall
+# back to the most recent upload so older clients keep working.
+DEFAULT_COLLECTION_ID = 'default'
+latest_collection_id = DEFAULT_COLLECTION_ID
+collection_lock = threading.RLock()
+
+# Uploads are fingerprinted so re-uploading a file reuses its collection
+manifest = None  # CollectionManifest, loaded by startup()
+inflight_uploads = {}  # fingerprint -> job still ingesting that content
+inflight_references = {}  # fingerprint -> uploads handed that job's collection so far
+
+# Most questions accepted by one /query/batch request
+QUERY_BATCH_MAX_SIZE = int(os.environ.get('QUERY_BATCH_MAX_SIZE', '32'))
+
+_started = False
+_startup_lock = threading.Lock()
+
+def startup():
+    """Create the data directories, load the collection manifest and warm up models.
+
+    Runs once per server process instead of at import: PDF extraction and
+    multi-process embedding start their workers with spawn, which re-imports
+    the __main__ module in every worker.
+    """
+    global manifest, _started
+    with _startup_lock:
+        if _started:
+            return
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        os.makedirs(os.path.join(CHROMA_BASE_PATH, DEFAULT_COLLECTION_ID), exist_ok=True)
+        manifest = CollectionManifest(CHROMA_BASE_PATH)
+        
+        logger.info(f"Redis Connected: {get_redis_client() is not None}")
+        logger.info(f"Using ChromaDB base path: {CHROMA_BASE_PATH}")
+        
+        # Load model weights at startup so the first request doesn't pay for it
+        if os.environ.get('WARMUP_MODELS', '1') == '1':
+            get_reranker()  # registers the local cross-encoder, if that backend is selected
+            registry.warmup()
+        _started = True
+
+@app.before_request
+def ensure_started():
+    # Servers that import app:app directly (gunicorn, flask run) start up on the first request
+    startup()
+
+def collection_path(collection_id):
+    return os.path.join(CHROMA_BASE_PATH, collection_id)
+
+def request_collection_id():
+    """The collection_id sent in the JSON body or query string, if any."""
+    data = request.get_json(silent=True) or {}
+    return data.get('collection_id') or request.args.get('collection_id')
+
+def resolve_collection(collection_id=None):
+    """Map a collection_id to its ChromaDB path; the path is None if it doesn't exist."""
+    if not collection_id:
+        with collection_lock:
+            collection_id = latest_collection_id
+    if secure_filename(collection_id) != collection_id:
+        return collection_id, None
+    chroma_path = collection_path(collection_id)
+    if not os.path.isdir(chroma_path):
+        return collection_id, None
+    return collection_id, chroma_path
+
+def set_latest_collection(collection_id):
+    global latest_collection_id
+    with collection_lock:
+        latest_collection_id = collection_id
+
+def create_collection(make_latest=True):
+    """Create an empty collection, by default making it the fallback for id-less requests."""
+    collection_id = str(uuid.uuid4())
+    os.makedirs(collection_path(collection_id), exist_ok=True)
+    if make_latest:
+        set_latest_collection(collection_id)
+    return collection_id
+
+def wants_stream(data, accept=None):
+    """Clients opt into streaming with "stream": true or by accepting text/event-stream.
+
+    `accept` is the Accept header, read from the Flask request unless given.
+    """
+    if accept is None:
+        accept = request.headers.get('Accept', '')
+    return bool(data.get('stream')) or 'text/event-stream' in accept
+
+def wants_refresh(data):
+    return bool(data.get('refresh')) or request.args.get('refresh') in ('1', 'true')
+
+def query_prompt(query):
+    """The interview questions prompt for requests for interview questions, else the standard one."""
+    is_interview_request = "interview" in query.lower() and "question" in query.lower()
+    return INTERVIEW_QUESTIONS_PROMPT if is_interview_request else PROMPT_TEMPLATE
+
+def stream_response(deltas, **done_fields):
+    """Relay answer deltas to the client as Server-Sent Events as they arrive."""
+    def events():
+        try:
+            for delta in deltas:
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+            yield f"event: done\ndata: {json.dumps(done_fields)}\n\n"
+        except Exception as e:
+            logger.error(f"Error while streaming response: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/query', methods=['POST'])
 def handle_query():
@@ -85,50 +161,97 @@ def handle_query():
     if not query:
         return jsonify({"error": "No query provided"}), 400
     
-    # Check if this is a request for interview questions
-    is_interview_request = "interview" in query.lower() and "question" in query.lower()
+    collection_id, chroma_path = resolve_collection(data.get('collection_id'))
+    if chroma_path is None:
+        return jsonify({"error": f"Unknown collection_id: {collection_id}"}), 404
     
-    # Update global reference to ensure using the right ChromaDB path
-    global CURRENT_CHROMA_PATH
-    # Override the path in the reasoning function
-    os.environ['CHROMA_PATH'] = CURRENT_CHROMA_PATH
+    # Optionally search a single resume section, e.g. "skills" or "education"
+    section = data.get('section')
+    if section and section not in SECTIONS:
+        return jsonify({"error": f"Unknown section: {section}", "sections": SECTIONS}), 400
+    
+    stream = wants_stream(data)
     
     try:
-        if is_interview_request:
-            # Use the specialized interview questions prompt
-            response = reasoning(query, INTERVIEW_QUESTIONS_PROMPT)
-        else:
-            # Use the standard prompt
-            response = reasoning(query, PROMPT_TEMPLATE)
+        # Requests for interview questions use the specialized interview prompt
+        response = reasoning(query, query_prompt(query), chroma_path, stream=stream, section=section)
         
-        return jsonify({"response": response})
+        if stream:
+            return stream_response(response, collection_id=collection_id)
+        return jsonify({"response": response, "collection_id": collection_id})
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
+# Answer a list of questions about one resume in a single request
+@app.route('/query/batch', methods=['POST'])
+def handle_query_batch():
+    data = request.get_json(silent=True) or {}
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "No queries provided"}), 400
+    if len(queries) > QUERY_BATCH_MAX_SIZE:
+        return jsonify({"error": f"At most {QUERY_BATCH_MAX_SIZE} queries per batch"}), 400
+    if not all(isinstance(query, str) and query.strip() for query in queries):
+        return jsonify({"error": "Every query must be a non-empty string"}), 400
+    
+    collection_id, chroma_path = resolve_collection(data.get('collection_id'))
+    if chroma_path is None:
+        return jsonify({"error": f"Unknown collection_id: {collection_id}"}), 404
+    
+    section = data.get('section')
+    if section and section not in SECTIONS:
+        return jsonify({"error": f"Unknown section: {section}", "sections": SECTIONS}), 400
+    
+    try:
+        start = time.perf_counter()
+        results = reasoning_batch(queries, [query_prompt(query) for query in queries], chroma_path, section=section)
+        # Failed questions carry their own "error"; the rest of the batch is still answered
+        return jsonify({
+            "results": results,
+            "collection_id": collection_id,
+            "took_ms": round((time.perf_counter() - start) * 1000, 1)
+        })
+    except Exception as e:
+        logger.error(f"Error processing query batch: {str(e)}")
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
 @app.route('/interview_questions', methods=['POST'])
 def handle_interview_questions():
-    """Specialized endpoint for generating interview questions"""
-    # Update global reference to ensure using the right ChromaDB path
-    global CURRENT_CHROMA_PATH
-    os.environ['CHROMA_PATH'] = CURRENT_CHROMA_PATH
+    """Interview questions generated for the resume at ingestion time"""
+    collection_id, chroma_path = resolve_collection(request_collection_id())
+    if chroma_path is None:
+        return jsonify({"error": f"Unknown collection_id: {collection_id}"}), 404
+    data = request.get_json(silent=True) or {}
     
     try:
-        # Use a specialized prompt for interview questions
-        response = reasoning(
-            "Generate 5 specific interview questions based on my resume",
-            INTERVIEW_QUESTIONS_PROMPT
-        )
+        # Pass "refresh": true to regenerate them instead of serving the stored set
+        insights = get_insights(chroma_path, refresh=wants_refresh(data))
+        response = insights["interview_questions"]
         
-        return jsonify({"response": response})
+        if wants_stream(data):
+            return stream_response(iter([response]), collection_id=collection_id)
+        return jsonify({"response": response, "collection_id": collection_id})
     except Exception as e:
         logger.error(f"Error generating interview questions: {str(e)}")
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
+@app.route('/summary', methods=['GET', 'POST'])
+def handle_summary():
+    """Structured resume summary generated at ingestion time"""
+    collection_id, chroma_path = resolve_collection(request_collection_id())
+    if chroma_path is None:
+        return jsonify({"error": f"Unknown collection_id: {collection_id}"}), 404
+    
+    try:
+        insights = get_insights(chroma_path, refresh=wants_refresh(request.get_json(silent=True) or {}))
+        return jsonify({"response": insights["summary"], "collection_id": collection_id})
+    except Exception as e:
+        logger.error(f"Error generating resume summary: {str(e)}")
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
 @app.route('/upload', methods=['POST'])
 def handle_upload():
-    global CURRENT_CHROMA_PATH
-    
     if 'file' not in request.files:
         return jsonify({"error": "No file part"}), 400
     file = request.files['file']
@@ -136,133 +259,213 @@ def handle_upload():
         return jsonify({"error": "No selected file"}), 400
     if file:
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        # Unique per upload so concurrent uploads of the same name never overwrite
+        # a file a background job has yet to read
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}-{filename}")
         file.save(file_path)
         
-        # Create a new unique ChromaDB path
-        unique_id = str(uuid.uuid4())
-        new_chroma_path = os.path.join(CHROMA_BASE_PATH, unique_id)
-        os.makedirs(new_chroma_path, exist_ok=True)
-        
-        # Update the global variable and environment variable
-        CURRENT_CHROMA_PATH = new_chroma_path
-        os.environ['CHROMA_PATH'] = CURRENT_CHROMA_PATH
-        
-        # Clear Redis cache if available
-        if redis_connected and redis_client:
-            try:
-                redis_client.flushdb()
-            except Exception as e:
-                logger.warning(f"Error clearing Redis: {str(e)}")
-        
-        try:
-            # Process the resume directly
-            documents = []
+        fingerprint = file_fingerprint(file_path)
+        with collection_lock:
+            # Identical content already ingested: reuse its collection, no embedding work
+            entry = manifest.lookup(fingerprint, EMBEDDING_MODEL_NAME)
+            if entry and os.path.isdir(collection_path(entry["collection_id"])):
+                remove_upload(file_path)
+                manifest.retain(fingerprint)
+                set_latest_collection(entry["collection_id"])
+                return jsonify({
+                    "message": f"File {filename} was already processed",
+                    "collection_id": entry["collection_id"],
+                    "deduplicated": True
+                }), 200
             
-            if filename.lower().endswith('.pdf'):
-                # For PDF, use PyPDFLoader directly
-                loader = PyPDFLoader(file_path)
-                documents = loader.load()
-                logger.info(f"Loaded PDF with {len(documents)} pages")
-            else:
-                # For non-PDF files, try to read as text
-                try:
-                    with open(file_path, 'rb') as f:
-                        content = f.read()
-                        try:
-                            text_content = content.decode('utf-8')
-                        except UnicodeDecodeError:
-                            return jsonify({"error": "File format not supported"}), 400
-                        
-                        document = Document(
-                            page_content=text_content,
-                            metadata={"source": file_path}
-                        )
-                        documents = [document]
-                except Exception as e:
-                    return jsonify({"error": f"Error reading file: {str(e)}"}), 500
+            # Identical content still being ingested: hand back the running job
+            running = inflight_uploads.get(fingerprint)
+            if running is not None and not running.done:
+                remove_upload(file_path)
+                inflight_references[fingerprint] += 1
+                return jsonify({
+                    "message": f"File {filename} is already being processed",
+                    "job_id": running.id,
+                    "collection_id": running.info["collection_id"],
+                    "deduplicated": True
+                }), 202
             
-            # Process documents
-            if documents:
-                # Copy to test directory for compatibility
-                test_file_path = os.path.join(TEST_DIR, filename)
-                shutil.copy(file_path, test_file_path)
-                
-                # Process and store in ChromaDB
-                chunks = split_documents(documents)
-                logger.info(f"Split into {len(chunks)} chunks")
-                
-                # Directly store in Chroma without using the function that might reuse paths
-                try:
-                    embeddings = get_embeddings()
-                    Chroma.from_documents(
-                        documents=chunks,
-                        embedding=embeddings,
-                        persist_directory=CURRENT_CHROMA_PATH
-                    )
-                    logger.info(f"Successfully embedded and stored {len(chunks)} chunks in {CURRENT_CHROMA_PATH}")
-                except Exception as e:
-                    logger.error(f"Error storing in Chroma: {str(e)}")
-                    return jsonify({"error": f"Error storing in Chroma: {str(e)}"}), 500
-                
-                return jsonify({"message": f"File {filename} processed successfully"}), 200
-            else:
-                return jsonify({"error": "No content could be extracted from the file"}), 400
-                
-        except Exception as e:
-            logger.error(f"Error processing file: {str(e)}")
-            return jsonify({"error": f"Error processing file: {str(e)}"}), 500
+            # Create a new collection for this resume; it becomes the default for
+            # id-less requests once ingestion has finished
+            collection_id = create_collection(make_latest=False)
+            chroma_path = collection_path(collection_id)
+            
+            # Make sure nothing cached for this collection outlives the new contents
+            invalidate_cache(chroma_path)
+            invalidate_answers(chroma_path)
+            
+            # Parse, split, embed and store in the background; clients poll /jobs/<job_id>
+            try:
+                job = ingestion_queue.submit(
+                    run_ingestion, file_path, collection_id, fingerprint, filename,
+                    filename=filename, collection_id=collection_id
+                )
+            except QueueFullError as e:
+                remove_upload(file_path)
+                shutil.rmtree(chroma_path, ignore_errors=True)
+                response = jsonify({"error": str(e)})
+                response.headers['Retry-After'] = '5'
+                return response, 503
+            inflight_uploads[fingerprint] = job
+            inflight_references[fingerprint] = 1
+        
+        return jsonify({
+            "message": f"File {filename} queued for processing",
+            "job_id": job.id,
+            "collection_id": collection_id
+        }), 202
+
+def remove_upload(file_path):
+    try:
+        os.remove(file_path)
+    except OSError as e:
+        logger.warning(f"Could not remove upload {file_path}: {e}")
+
+def run_ingestion(job, file_path, collection_id, fingerprint, filename):
+    chroma_path = collection_path(collection_id)
+    try:
+        result = ingest_file(job, file_path, chroma_path)
+        with collection_lock:
+            manifest.record(fingerprint, collection_id, filename, EMBEDDING_MODEL_NAME,
+                            references=inflight_references.get(fingerprint, 1))
+    except Exception:
+        handle_pool.close(chroma_path)
+        shutil.rmtree(chroma_path, ignore_errors=True)
+        raise
+    finally:
+        remove_upload(file_path)
+        with collection_lock:
+            inflight_uploads.pop(fingerprint, None)
+            inflight_references.pop(fingerprint, None)
+    set_latest_collection(collection_id)
+    return result
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job_id: {job_id}"}), 404
+    return jsonify(job.to_dict()), 200
 
 # Route to clear CV data
 @app.route('/clear_cv_data', methods=['POST'])
 def clear_cv_data():
     try:
-        # Create a new unique ChromaDB path
-        unique_id = str(uuid.uuid4())
-        new_chroma_path = os.path.join(CHROMA_BASE_PATH, unique_id)
-        os.makedirs(new_chroma_path, exist_ok=True)
-        
-        # Update the global variable
-        global CURRENT_CHROMA_PATH
-        CURRENT_CHROMA_PATH = new_chroma_path
-        os.environ['CHROMA_PATH'] = CURRENT_CHROMA_PATH
+        # Never fall back to the latest upload here: that may be someone else's resume
+        requested_id = request_collection_id()
+        if not requested_id:
+            return jsonify({"error": "collection_id is required"}), 400
+        collection_id, chroma_path = resolve_collection(requested_id)
+        if chroma_path is None:
+            return jsonify({"error": f"Unknown collection_id: {collection_id}"}), 404
         
-        # Clear Redis cache if available
-        if redis_connected and redis_client:
-            try:
-                redis_client.flushdb()
-            except Exception as e:
-                logger.warning(f"Error clearing Redis: {str(e)}")
+        with collection_lock:
+            if any(job.info["collection_id"] == collection_id for job in inflight_uploads.values() if not job.done):
+                return jsonify({"error": f"Collection {collection_id} is still being processed"}), 409
+            
+            # Identical uploads share one collection; only the last reference deletes it
+            remaining = manifest.release(collection_id) if collection_id != DEFAULT_COLLECTION_ID else 0
+            if remaining == 0:
+                # Release the collection's handle and cache, then drop its data
+                handle_pool.close(chroma_path)
+                invalidate_cache(chroma_path)
+                invalidate_answers(chroma_path)
+                if collection_id != DEFAULT_COLLECTION_ID:
+                    shutil.rmtree(chroma_path, ignore_errors=True)
+                    get_candidate_index().remove(collection_id)
+            
+            # Hand back a fresh, empty collection
+            new_collection_id = create_collection()
         
-        return jsonify({"message": "ChromaDB data cleared successfully"}), 200
+        return jsonify({
+            "message": "ChromaDB data cleared successfully",
+            "collection_id": new_collection_id
+        }), 200
     except Exception as e:
         logger.error(f"Error clearing data: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+# Rank resumes across every collection, e.g. to shortlist candidates for a role
+@app.route('/search', methods=['POST'])
+def search_candidates():
+    data = request.get_json(silent=True) or {}
+    query = data.get('query')
+    if not query:
+        return jsonify({"error": "No query provided"}), 400
+    
+    # "fast", "balanced" or "high": trades recall for latency; ef_search overrides the preset's beam width
+    recall = data.get('recall', 'balanced')
+    if recall not in RECALL_PRESETS:
+        return jsonify({"error": f"Unknown recall setting: {recall}", "recall": list(RECALL_PRESETS)}), 400
+    section = data.get('section')
+    if section and section not in SECTIONS:
+        return jsonify({"error": f"Unknown section: {section}", "sections": SECTIONS}), 400
+    preset = RECALL_PRESETS[recall]
+    try:
+        top_k = min(max(int(data.get('top_k', 10)), 1), SEARCH_MAX_TOP_K)
+        ef_search = min(max(int(data.get('ef_search', preset['ef_search'])), 1), SEARCH_MAX_EF)
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k and ef_search must be integers"}), 400
+    
+    try:
+        start = time.perf_counter()
+        candidates = get_candidate_index().search(
+            embed_query(query), top_k, ef_search=ef_search, oversample=preset['oversample'], section=section
+        )
+        return jsonify({
+            "candidates": candidates,
+            "ef_search": ef_search,
+            "took_ms": round((time.perf_counter() - start) * 1000, 1)
+        })
+    except Exception as e:
+        logger.error(f"Error searching candidates: {str(e)}")
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
 # Get current status of the ChromaDB
 @app.route('/status', methods=['GET'])
 def get_status():
     try:
-        global CURRENT_CHROMA_PATH
+        collection_id, chroma_path = resolve_collection(request_collection_id())
         
-        # Check if documents are loaded in the current ChromaDB
-        chroma_exists = os.path.exists(CURRENT_CHROMA_PATH)
+        # Check if documents are loaded in the requested ChromaDB
+        chroma_exists = chroma_path is not None
         chroma_populated = False
         
         if chroma_exists:
             # Check if there are files in the ChromaDB directory
-            chroma_files = os.listdir(CURRENT_CHROMA_PATH)
+            chroma_files = os.listdir(chroma_path)
             chroma_populated = len(chroma_files) > 0
         
         return jsonify({
-            "chroma_path": CURRENT_CHROMA_PATH,
+            "collection_id": collection_id,
+            "chroma_path": chroma_path,
             "chroma_exists": chroma_exists,
             "chroma_populated": chroma_populated,
-            "redis_connected": redis_connected
+            "redis_connected": get_redis_client() is not None,
+            "models": registry.memory_usage(),
+            "open_chroma_handles": len(handle_pool.open_paths()),
+            "query_cache": get_cache_stats(),
+            "answer_cache": get_answer_cache_stats(),
+            "search_index": get_candidate_index().stats(),
+            "ingestion_jobs_pending": ingestion_queue.pending(),
+            "rerank_cache": getattr(get_reranker(), "stats", lambda: None)()
         }), 200
     except Exception as e:
         logger.error(f"Error getting status: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+# Release a loaded model's memory; it is reloaded on next use
+@app.route('/models/<path:model_name>/unload', methods=['POST'])
+def unload_model(model_name):
+    if registry.unload(model_name):
+        return jsonify({"message": f"Model {model_name} unloaded"}), 200
+    return jsonify({"error": f"Model {model_name} is not loaded"}), 404
+
 if __name__ == "__main__":
+    startup()
     app.run(debug=True)
\ No newline at end of file
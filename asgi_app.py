@@ -0,0 +1,128 @@
+"""Async serving entry point.
+
+/query and /interview_questions run natively on the event loop with the async
+Groq and Cohere clients, while embedding and Chroma work is offloaded to a
+thread pool. Every other endpoint is served by the Flask app mounted below, so
+both entry points expose the same API.
+
+Run with:  uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+from app import app as flask_app, startup, resolve_collection, query_prompt, wants_stream as flask_wants_stream
+from src.data_processing.resume_insights import get_insights
+from src.data_processing.resume_chunker import SECTIONS
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.middleware.wsgi import WSGIMiddleware
+from concurrent.futures import ThreadPoolExecutor
+from src.main_reasoning import reasoning_async
+from fastapi import FastAPI, Request
+import asyncio
+import logging
+import json
+import os
+
+logger = logging.getLogger(__name__)
+
+# Threads for CPU-bound work (query embedding, Chroma search, cache I/O)
+EXECUTOR_WORKERS = int(os.environ.get('ASGI_EXECUTOR_WORKERS', str(os.cpu_count() or 4)))
+executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="asgi-cpu")
+
+app = FastAPI()
+# Directories, manifest and model warmup, done once before serving rather than at import
+app.add_event_handler("startup", startup)
+
+
+@app.middleware("http")
+async def allow_all_origins(request: Request, call_next):
+    # Same policy as CORS(app) on the Flask side; Flask responses already carry it
+    response = await call_next(request)
+    response.headers.setdefault("access-control-allow-origin", "*")
+    return response
+
+
+def wants_stream(request: Request, data):
+    # Same rule as the Flask app, fed this request's Accept header
+    return flask_wants_stream(data, request.headers.get('accept', ''))
+
+
+def stream_response(deltas, **done_fields):
+    """Relay answer deltas to the client as Server-Sent Events as they arrive."""
+    async def events():
+        try:
+            async for delta in deltas:
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+            yield f"event: done\ndata: {json.dumps(done_fields)}\n\n"
+        except Exception as e:
+            logger.error(f"Error while streaming response: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+async def _single_delta(text):
+    yield text
+
+
+async def request_json(request: Request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+@app.post('/query')
+async def handle_query(request: Request):
+    data = await request_json(request)
+    query = data.get('query')
+    if not query:
+        return JSONResponse({"error": "No query provided"}, status_code=400)
+
+    collection_id, chroma_path = resolve_collection(data.get('collection_id'))
+    if chroma_path is None:
+        return JSONResponse({"error": f"Unknown collection_id: {collection_id}"}, status_code=404)
+
+    section = data.get('section')
+    if section and section not in SECTIONS:
+        return JSONResponse({"error": f"Unknown section: {section}", "sections": SECTIONS}, status_code=400)
+
+    stream = wants_stream(request, data)
+
+    try:
+        # Requests for interview questions use the specialized interview prompt
+        response = await reasoning_async(
+            query, query_prompt(query), chroma_path, stream=stream, executor=executor, section=section
+        )
+        if stream:
+            return stream_response(response, collection_id=collection_id)
+        return {"response": response, "collection_id": collection_id}
+    except Exception as e:
+        logger.error(f"Error processing query: {str(e)}")
+        return JSONResponse({"error": f"An error occurred: {str(e)}"}, status_code=500)
+
+
+@app.post('/interview_questions')
+async def handle_interview_questions(request: Request):
+    """Interview questions generated for the resume at ingestion time"""
+    data = await request_json(request)
+    collection_id, chroma_path = resolve_collection(data.get('collection_id') or request.query_params.get('collection_id'))
+    if chroma_path is None:
+        return JSONResponse({"error": f"Unknown collection_id: {collection_id}"}, status_code=404)
+
+    try:
+        refresh = bool(data.get('refresh')) or request.query_params.get('refresh') in ('1', 'true')
+        loop = asyncio.get_running_loop()
+        insights = await loop.run_in_executor(executor, get_insights, chroma_path, refresh)
+        response = insights["interview_questions"]
+        if wants_stream(request, data):
+            return stream_response(_single_delta(response), collection_id=collection_id)
+        return {"response": response, "collection_id": collection_id}
+    except Exception as e:
+        logger.error(f"Error generating interview questions: {str(e)}")
+        return JSONResponse({"error": f"An error occurred: {str(e)}"}, status_code=500)
+
+
+# Uploads, jobs, status and the rest stay on the Flask app
+app.mount("/", WSGIMiddleware(flask_app))
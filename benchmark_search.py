@@ -0,0 +1,94 @@
+"""Candidate search latency benchmark.
+
+Fills a throwaway search index with random unit vectors standing in for resume
+chunks, leaving the delta log as full as it gets before a compaction, then times
+CandidateIndex.search() for every recall preset. /search should stay under
+100 ms p95 at 100k resumes on CPU:
+
+    python benchmark_search.py --resumes 100000 --chunks-per-resume 8 --dimension 768
+
+Random vectors are a worst case for the HNSW graph, and they only say something
+about latency; recall has to be measured with real embeddings.
+"""
+from src.database.candidate_index import CandidateIndex, RECALL_PRESETS, MAIN_INDEX_FILE, SEARCH_DELTA_MAX_VECTORS
+import numpy as np
+import argparse
+import tempfile
+import shutil
+import faiss
+import time
+import os
+
+# Chunks registered and added to the graph per step while building
+BUILD_BATCH = 10000
+
+
+def random_vectors(rng, count, dimension):
+    vectors = rng.standard_normal((count, dimension), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def build(index, resumes, chunks_per_resume, dimension, delta, rng):
+    """Put every chunk in the HNSW graph except the last `delta`, which go through the delta log."""
+    chroma_path = os.path.join(index.directory, "benchmark")
+    total = resumes * chunks_per_resume
+    delta = min(delta, total)
+
+    def chunks(start, count):
+        chunk_ids = [f"chunk-{n}" for n in range(start, start + count)]
+        metadatas = [{"resume_id": f"resume-{n // chunks_per_resume}"} for n in range(start, start + count)]
+        return chunk_ids, metadatas
+
+    main = index._new_hnsw(dimension)
+    for start in range(0, total - delta, BUILD_BATCH):
+        count = min(BUILD_BATCH, total - delta - start)
+        ids = index.record(chroma_path, *chunks(start, count))
+        main.add_with_ids(random_vectors(rng, count, dimension), np.asarray(ids, dtype=np.int64))
+        print(f"Indexed {start + count}/{total - delta} chunks in the graph", end="\r", flush=True)
+    print()
+    index._save(MAIN_INDEX_FILE, main)
+    index._db.execute("UPDATE chunks SET indexed = 1")
+    index._db.commit()
+
+    if delta:
+        chunk_ids, metadatas = chunks(total - delta, delta)
+        index.add(chroma_path, chunk_ids, random_vectors(rng, delta, dimension), metadatas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time candidate search over a synthetic resume index.")
+    parser.add_argument("--resumes", type=int, default=100000, help="Number of resumes in the index")
+    parser.add_argument("--chunks-per-resume", type=int, default=8, help="Chunks indexed for every resume")
+    parser.add_argument("--dimension", type=int, default=768, help="Embedding dimension")
+    parser.add_argument("--delta", type=int, default=SEARCH_DELTA_MAX_VECTORS - 1,
+                        help="Chunks left in the exact delta index instead of the graph")
+    parser.add_argument("--queries", type=int, default=500, help="Searches timed per recall preset")
+    parser.add_argument("--top-k", type=int, default=10, help="Resumes returned per search")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    directory = tempfile.mkdtemp(prefix="search-benchmark-")
+    try:
+        index = CandidateIndex(directory)
+        started = time.perf_counter()
+        build(index, args.resumes, args.chunks_per_resume, args.dimension, args.delta, rng)
+        print(f"Built {index.stats()} in {time.perf_counter() - started:.0f} s")
+
+        queries = random_vectors(rng, args.queries, args.dimension)
+        for name, preset in RECALL_PRESETS.items():
+            index.search(queries[0], args.top_k, **preset)  # first search loads the graph
+            latencies = []
+            for query in queries:
+                started = time.perf_counter()
+                index.search(query, args.top_k, **preset)
+                latencies.append((time.perf_counter() - started) * 1000)
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            print(f"{name:>8}: p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""Bulk resume ingestion.
+
+Loads a directory of resumes (PDF or UTF-8 text) into one or more collection
+shards under data/processed/chroma, tagging every chunk with the resume_id of
+the file it came from. Progress is checkpointed after each batch, so running
+the same command again after an interruption continues where it stopped.
+
+    python bulk_ingest.py /path/to/resumes --shards 4 --prefix resumes
+
+The shards are ordinary collections: query one with collection_id=resumes-000.
+"""
+from data.process_data import store_embedded_chunks
+from src.data_processing.pdf_extraction import submit_pdf, shutdown as shutdown_extraction
+from src.data_processing.resume_chunker import iter_resume_chunks
+from src.data_processing.embedding_engine import get_embedding_engine
+from src.data_processing.cache_functions import invalidate_cache
+from src.data_processing.answer_cache import invalidate_answers
+from src.database.collection_manifest import file_fingerprint
+from src.database.chroma_handles import handle_pool
+from src.database.lexical_index import build_lexical_index
+from src.database.candidate_index import get_candidate_index
+from src.data_processing.get_embeddings import get_embeddings
+from langchain.schema.document import Document
+from concurrent.futures import Future
+import argparse
+import json
+import time
+import os
+
+CHROMA_BASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'processed', 'chroma')
+RESUME_EXTENSIONS = ('.pdf', '.txt')
+
+
+def find_resumes(directory):
+    """Every resume under `directory`, as paths relative to it, in a stable order."""
+    found = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.lower().endswith(RESUME_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(found)
+
+
+def shard_for(resume_id, shards):
+    return int(resume_id, 16) % shards
+
+
+def shard_collection_id(prefix, shard):
+    return f"{prefix}-{shard:03d}"
+
+
+def load_checkpoint(path):
+    """Replay the checkpoint log into {"shards": n, "done": {relpath: entry}, "failed": {relpath: error}}."""
+    checkpoint = {"done": {}, "failed": {}}
+    if not os.path.exists(path):
+        return checkpoint
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interruption
+            if "shards" in record:
+                checkpoint["shards"] = record["shards"]
+            elif "done" in record:
+                checkpoint["done"][record["relpath"]] = record["done"]
+                checkpoint["failed"].pop(record["relpath"], None)
+            elif "failed" in record:
+                checkpoint["failed"][record["relpath"]] = record["failed"]
+    return checkpoint
+
+
+def append_checkpoint(path, records):
+    """Append records to the checkpoint log; earlier batches are never rewritten."""
+    with open(path, "a+b") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            # Start on a fresh line after a record cut short by an interruption
+            prefix = b"" if f.read(1) == b"\n" else b"\n"
+        else:
+            prefix = b""
+        f.write(prefix + b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in records))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def submit_extraction(path):
+    """Future for one file's page texts; PDFs are parsed on the extraction worker pool."""
+    if path.lower().endswith('.pdf'):
+        return submit_pdf(path)
+    future = Future()
+    try:
+        with open(path, 'rb') as f:
+            future.set_result([f.read().decode('utf-8')])
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+class StageTimer:
+    """Wall time spent per ingestion stage."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    def add(self, stage, start):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + time.perf_counter() - start
+
+    def summary(self):
+        return ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in self.seconds.items())
+
+
+def ingest_batch(directory, batch, futures, args, timer):
+    """Extract, chunk, embed and store one batch; returns {relpath: entry} for the checkpoint."""
+    search_index = get_candidate_index()
+    results, failed = {}, {}
+    chunks = []
+    seen = {}  # resume_id -> first relpath in this batch with that content
+    for relpath in batch:
+        path = os.path.join(directory, relpath)
+        start = time.perf_counter()
+        try:
+            texts = futures.pop(relpath).result()
+            resume_id = file_fingerprint(path)[:16]
+        except Exception as e:
+            failed[relpath] = str(e)
+            continue
+        finally:
+            timer.add("extract", start)
+        if resume_id in seen:
+            # Identical copies share a resume_id; store the content once
+            results[relpath] = {"resume_id": resume_id, "shard": shard_for(resume_id, args.shards),
+                                "chunks": 0, "duplicate_of": seen[resume_id]}
+            continue
+
+        start = time.perf_counter()
+        pages = [
+            Document(page_content=text, metadata={"source": path, "page": page_number})
+            for page_number, text in enumerate(texts)
+        ]
+        resume_chunks = list(iter_resume_chunks(pages))
+        for chunk in resume_chunks:
+            chunk.metadata.update({"resume_id": resume_id, "filename": os.path.basename(path)})
+        chunks.extend(resume_chunks)
+        timer.add("split", start)
+        if not resume_chunks:
+            failed[relpath] = "No content could be extracted from the file"
+            continue
+        seen[resume_id] = relpath
+        results[relpath] = {
+            "resume_id": resume_id,
+            "shard": shard_for(resume_id, args.shards),
+            "chunks": len(resume_chunks),
+        }
+
+    start = time.perf_counter()
+    vectors = get_embedding_engine().embed([chunk.page_content for chunk in chunks]) if chunks else []
+    timer.add("embed", start)
+
+    start = time.perf_counter()
+    by_shard = {}
+    for chunk, vector in zip(chunks, vectors):
+        shard = shard_for(chunk.metadata["resume_id"], args.shards)
+        by_shard.setdefault(shard, ([], []))
+        by_shard[shard][0].append(chunk)
+        by_shard[shard][1].append(vector)
+    for shard, (shard_chunks, shard_vectors) in by_shard.items():
+        chroma_path = os.path.join(args.output, shard_collection_id(args.prefix, shard))
+        resume_ids = sorted({chunk.metadata["resume_id"] for chunk in shard_chunks})
+        # A batch stored just before an interruption is re-run on resume; replace, don't duplicate
+        with handle_pool.lease(chroma_path, get_embeddings()) as chroma_db:
+            chroma_db._collection.delete(where={"resume_id": {"$in": resume_ids}})
+        search_index.remove(shard_collection_id(args.prefix, shard), resume_ids)
+        ids = store_embedded_chunks(shard_chunks, shard_vectors, chroma_path, build_index=False)
+        # Vectors are merged into the cross-resume HNSW graph once, at the end of the run
+        search_index.record(chroma_path, ids, [chunk.metadata for chunk in shard_chunks])
+    timer.add("store", start)
+    return results, failed
+
+
+def run(args):
+    directory = os.path.abspath(args.directory)
+    os.makedirs(args.output, exist_ok=True)
+    checkpoint_path = args.checkpoint or os.path.join(args.output, f"{args.prefix}.checkpoint.jsonl")
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint.get("shards", args.shards) != args.shards:
+        raise SystemExit(f"{checkpoint_path} was written with --shards {checkpoint['shards']}; "
+                         f"pass the same value or a new --prefix")
+    if "shards" not in checkpoint:
+        append_checkpoint(checkpoint_path, [{"shards": args.shards}])
+    checkpoint["shards"] = args.shards
+
+    pending = [relpath for relpath in find_resumes(directory) if relpath not in checkpoint["done"]]
+    if not args.retry_failed:
+        pending = [relpath for relpath in pending if relpath not in checkpoint["failed"]]
+    print(f"{len(checkpoint['done'])} resumes already ingested, {len(pending)} to go")
+
+    batches = [pending[i:i + args.batch_size] for i in range(0, len(pending), args.batch_size)]
+    timer = StageTimer()
+    touched_shards = set()
+    docs = chunks = 0
+    run_start = time.perf_counter()
+    futures = {}
+    try:
+        for index, batch in enumerate(batches):
+            # Parse the next batch on the worker pool while this one is embedded
+            for upcoming in batches[index:index + 2]:
+                for relpath in upcoming:
+                    if relpath not in futures:
+                        futures[relpath] = submit_extraction(os.path.join(directory, relpath))
+
+            results, failed = ingest_batch(directory, batch, futures, args, timer)
+            checkpoint["done"].update(results)
+            for relpath in results:
+                checkpoint["failed"].pop(relpath, None)
+            checkpoint["failed"].update(failed)
+            append_checkpoint(checkpoint_path, [
+                *({"relpath": relpath, "done": entry} for relpath, entry in results.items()),
+                *({"relpath": relpath, "failed": error} for relpath, error in failed.items()),
+            ])
+
+            touched_shards.update(entry["shard"] for entry in results.values())
+            docs += len(results)
+            chunks += sum(entry["chunks"] for entry in results.values())
+            elapsed = time.perf_counter() - run_start
+            print(
+                f"[{index + 1}/{len(batches)}] {docs} resumes, {chunks} chunks, {len(failed)} failed in batch | "
+                f"{docs / elapsed:.1f} docs/s, {chunks / elapsed:.1f} chunks/s | {timer.summary()}"
+            )
+    finally:
+        shutdown_extraction()
+
+        # Keyword indexes and caches are refreshed once per shard rather than per batch
+        start = time.perf_counter()
+        for shard in sorted(touched_shards):
+            chroma_path = os.path.join(args.output, shard_collection_id(args.prefix, shard))
+            build_lexical_index(chroma_path)
+            invalidate_cache(chroma_path)
+            invalidate_answers(chroma_path)
+        # Also picks up chunks recorded by an earlier, interrupted run
+        if args.rebuild_search_index:
+            get_candidate_index().rebuild()
+        else:
+            get_candidate_index().compact()
+        timer.add("index", start)
+
+    elapsed = time.perf_counter() - run_start
+    print(f"Ingested {docs} resumes ({chunks} chunks) in {elapsed:.1f}s: "
+          f"{docs / elapsed if elapsed else 0:.1f} docs/s, {chunks / elapsed if elapsed else 0:.1f} chunks/s")
+    print(f"Stage time: {timer.summary()}")
+    if checkpoint["failed"]:
+        print(f"{len(checkpoint['failed'])} files failed; see {checkpoint_path} (rerun with --retry-failed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a directory of resumes into sharded collections.")
+    parser.add_argument("directory", help="Directory searched recursively for .pdf and .txt resumes")
+    parser.add_argument("--output", default=CHROMA_BASE_PATH, help="Base path holding the collections")
+    parser.add_argument("--prefix", default="bulk", help="Shard collections are named <prefix>-000, <prefix>-001, ...")
+    parser.add_argument("--shards", type=int, default=1, help="Number of collections to spread resumes over")
+    parser.add_argument("--batch-size", type=int, default=64, help="Resumes embedded and stored per checkpoint")
+    parser.add_argument("--checkpoint", help="Checkpoint log (default: <output>/<prefix>.checkpoint.jsonl)")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry files that failed in earlier runs")
+    parser.add_argument("--rebuild-search-index", action="store_true",
+                        help="Rebuild the /search HNSW graph from scratch (after changing SEARCH_HNSW_M or "
+                             "SEARCH_HNSW_EF_CONSTRUCTION)")
+    args = parser.parse_args()
+    if args.shards < 1 or args.batch_size < 1:
+        parser.error("--shards and --batch-size must be at least 1")
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,14 @@
-from langchain_community.document_loaders import PyPDFDirectoryLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from src.data_processing.embedding_engine import get_embedding_engine
 from src.data_processing.get_embeddings import get_embeddings
-from langchain_community.vectorstores import Chroma
+from src.data_processing.resume_insights import generate_insights
+from src.data_processing.resume_chunker import chunk_resume, iter_resume_chunks
+from src.data_processing.pdf_extraction import extract_pdf_pages, pdf_paths
+from src.database.chroma_handles import handle_pool
+from src.database.lexical_index import build_lexical_index
+from src.database.candidate_index import get_candidate_index
+from langchain.schema.document import Document
+import uuid
+import time
 import os
 
 # Use environment variable or default for ChromaDB path
@@ -11,52 +18,180 @@ def get_chroma_path():
 # Default data path
 DATA_PATH = os.path.join(os.path.dirname(__file__), 'test')
 
+# Generate the resume summary and interview questions at ingestion time
+PRECOMPUTE_INSIGHTS = os.environ.get('PRECOMPUTE_INSIGHTS', '1') == '1'
+
+# Engine batches of chunks buffered while streaming pages, so length sorting has material to work with
+EMBED_STREAM_BATCHES = int(os.environ.get('EMBED_STREAM_BATCHES', '8'))
+
 def load_documents():
     """Load documents from the data/test directory"""
-    loader = PyPDFDirectoryLoader(DATA_PATH)
-    documents = loader.load()
+    documents = list(extract_pdf_pages(pdf_paths(DATA_PATH)))
     print(f"Loaded {len(documents)} documents from {DATA_PATH}")
     return documents
 
+def iter_file_pages(file_path, on_page_count=None):
+    """Yield the pages of a single PDF or UTF-8 text file as they are extracted"""
+    if file_path.lower().endswith('.pdf'):
+        yield from extract_pdf_pages([file_path], on_page_count)
+        return
+
+    if on_page_count:
+        on_page_count(1)
+
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    try:
+        text_content = content.decode('utf-8')
+    except UnicodeDecodeError:
+        raise ValueError("File format not supported")
+    yield Document(page_content=text_content, metadata={"source": file_path})
+
+def load_file(file_path):
+    """Load a single PDF or UTF-8 text file"""
+    documents = list(iter_file_pages(file_path))
+    print(f"Loaded {len(documents)} pages from {file_path}")
+    return documents
+
 def split_documents(documents):
-    """Split documents into chunks"""
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-    )
-    
-    # Structure the content with a prompt template
-    prompt_template = """
-    Below are chunks of a document that can be used to answer a question.
-    
-    {document_content}
-    """
-    
-    # Split documents into chunks
-    chunks = text_splitter.split_documents(documents)
-    
-    # Apply the prompt template to each chunk
-    for chunk in chunks:
-        chunk.page_content = prompt_template.format(document_content=chunk.page_content)
-    
+    """Split documents into section-tagged chunks of raw resume text"""
+    chunks = chunk_resume(documents)
     print(f"Split into {len(chunks)} chunks")
     return chunks
 
-def embed_and_store_documents(chunks):
+def embed_chunks(chunks, on_progress=None):
+    """Embed chunk texts in batches, calling on_progress(done, total) after each batch"""
+    texts = [chunk.page_content for chunk in chunks]
+    return get_embedding_engine().embed(texts, on_progress)
+
+def embed_pages(pages, on_progress=None):
+    """Split and embed pages while later ones are still being extracted.
+
+    Chunks are buffered across pages and embedded EMBED_STREAM_BATCHES engine
+    batches at a time, so the engine's length sorting spans many pages, calling
+    on_progress(pages_done) after each flush. Returns (page count, chunks,
+    vectors, seconds spent embedding).
+    """
+    engine = get_embedding_engine()
+    batch_size = engine.batch_size * max(engine.processes, 1) * max(EMBED_STREAM_BATCHES, 1)
+    stats = {"pages": 0, "embed_seconds": 0.0}
+    chunks, vectors, pending = [], [], []
+
+    def counted(pages):
+        for page in pages:
+            stats["pages"] += 1
+            yield page
+
+    def embed_pending():
+        start = time.perf_counter()
+        vectors.extend(embed_chunks(pending))
+        stats["embed_seconds"] += time.perf_counter() - start
+        chunks.extend(pending)
+        pending.clear()
+        if on_progress:
+            on_progress(stats["pages"])
+
+    for chunk in iter_resume_chunks(counted(pages)):
+        pending.append(chunk)
+        if len(pending) >= batch_size:
+            embed_pending()
+    if pending:
+        embed_pending()
+    return stats["pages"], chunks, vectors, stats["embed_seconds"]
+
+def max_add_batch(chroma_db):
+    """Most records one _collection.add() accepts (SQLite variable limit), with a safe default"""
+    client = getattr(chroma_db, "_client", None)
+    try:
+        return int(client.get_max_batch_size())
+    except Exception:
+        return int(getattr(client, "max_batch_size", 5000) or 5000)
+
+def store_embedded_chunks(chunks, vectors, chroma_path=None, build_index=True):
+    """Write already-embedded chunks to Chroma without embedding them again; returns their IDs
+
+    Bulk loads pass build_index=False and build the keyword index once at the end.
+    """
+    chroma_path = chroma_path or get_chroma_path()
+    ids = [str(uuid.uuid4()) for _ in chunks]
+    with handle_pool.lease(chroma_path, get_embeddings()) as chroma_db:
+        # Chroma rejects a single add larger than its client's max batch size
+        batch_size = max_add_batch(chroma_db)
+        for start in range(0, len(chunks), batch_size):
+            end = start + batch_size
+            chroma_db._collection.add(
+                ids=ids[start:end],
+                embeddings=[list(vector) for vector in vectors[start:end]],
+                # Chroma rejects empty metadata dicts
+                metadatas=[chunk.metadata or {"source": "unknown"} for chunk in chunks[start:end]],
+                documents=[chunk.page_content for chunk in chunks[start:end]],
+            )
+    # Keep the keyword index in step with what Chroma holds
+    if build_index:
+        build_lexical_index(chroma_path)
+    return ids
+
+def ingest_directory(directory, chroma_path=None):
+    """Extract, split, embed and store every PDF in `directory`, overlapping parsing with embedding"""
+    chroma_path = chroma_path or get_chroma_path()
+    pages, chunks, vectors, _ = embed_pages(extract_pdf_pages(pdf_paths(directory)))
+    if chunks:
+        store_embedded_chunks(chunks, vectors, chroma_path)
+    print(f"Embedded and stored {len(chunks)} chunks from {pages} pages in {chroma_path}")
+    return pages, len(chunks)
+
+def embed_and_store_documents(chunks, chroma_path=None):
     """Embed and store documents in Chroma"""
-    chroma_path = get_chroma_path()
+    chroma_path = chroma_path or get_chroma_path()
     print(f"Storing documents in ChromaDB at: {chroma_path}")
     
-    # Get embeddings
-    embeddings = get_embeddings()
-    
-    # Store documents in Chroma
-    Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=chroma_path
-    )
+    vectors = embed_chunks(chunks)
+    store_embedded_chunks(chunks, vectors, chroma_path)
     
     print(f"Documents embedded and stored in {chroma_path}")
     return True
 
+def ingest_file(job, file_path, chroma_path):
+    """Parse, split, embed and store one file, reporting each stage on `job` (may be None)"""
+    def report(stage, progress=None):
+        if job is not None:
+            job.update(stage, progress)
+
+    report("parsing")
+    # The extractor reports the page count once it has opened the file, so it is only parsed there
+    total = {"pages": 1}
+
+    def on_page_count(count):
+        total["pages"] = count
+        report("embedding", 0.0)
+
+    # Pages are extracted in worker processes and split and embedded as they arrive
+    pages, chunks, vectors, embed_seconds = embed_pages(
+        iter_file_pages(file_path, on_page_count), lambda done: report("embedding", done / max(total["pages"], 1))
+    )
+    if not chunks:
+        raise ValueError("No content could be extracted from the file")
+
+    report("storing", 0.0)
+    ids = store_embedded_chunks(chunks, vectors, chroma_path)
+    # Searchable across resumes through /search straight away
+    get_candidate_index().add(chroma_path, ids, vectors, [chunk.metadata for chunk in chunks])
+    print(f"Successfully embedded and stored {len(chunks)} chunks in {chroma_path}")
+
+    insights_ready = False
+    if PRECOMPUTE_INSIGHTS:
+        report("summarizing", 0.0)
+        try:
+            generate_insights(chroma_path)
+            insights_ready = True
+        except Exception as e:
+            # The collection is usable without them; they are generated on first request
+            print(f"Could not precompute resume insights: {e}")
+
+    return {
+        "pages": pages,
+        "chunks": len(chunks),
+        "embed_seconds": round(embed_seconds, 3),
+        "chunks_per_second": round(len(chunks) / embed_seconds, 1) if embed_seconds > 0 else None,
+        "insights_ready": insights_ready,
+    }
@@ -12,6 +12,8 @@ const RAGInterface = () => {
   const [activeChat, setActiveChat] = useState(null);
   const [savedChats, setSavedChats] = useState([]);
   const [uploadSuccess, setUploadSuccess] = useState(false);
+  // Collection holding the uploaded resume; sent with every request
+  const [collectionId, setCollectionId] = useState(null);
   
   // Example questions
   const exampleQuestions = [
@@ -56,6 +58,19 @@ const RAGInterface = () => {
     }
   }, []);
 
+  // Poll an ingestion job until it has finished or failed
+  const waitForJob = async (jobId) => {
+    while (true) {
+      const response = await fetch(`http://localhost:5000/jobs/${jobId}`);
+      const job = await response.json();
+      if (job.stage === 'done') return job;
+      if (job.stage === 'failed' || !response.ok) {
+        throw new Error(job.error || 'Ingestion failed');
+      }
+      await new Promise(resolve => setTimeout(resolve, 500));
+    }
+  };
+
   const handleFileUpload = async (event) => {
     const uploadedFile = event.target.files[0];
     if (!uploadedFile) return;
@@ -73,7 +88,15 @@ const RAGInterface = () => {
         body: formData,
       });
       const data = await response.json();
+      if (!response.ok) {
+        throw new Error(data.error);
+      }
       console.log(data.message);
+      // Re-uploads of an already processed file come back without a job
+      if (data.job_id) {
+        await waitForJob(data.job_id);
+      }
+      setCollectionId(data.collection_id);
       setUploadSuccess(true);
       
       // Clear the current chat and show a confirmation message
@@ -110,7 +133,7 @@ const RAGInterface = () => {
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ query: inputMessage }),
+        body: JSON.stringify({ query: inputMessage, collection_id: collectionId }),
       });
       const data = await response.json();
       
@@ -175,7 +198,8 @@ const RAGInterface = () => {
     setIsLoading(true);
     try {
       // First check server status
-      const statusResponse = await fetch('http://localhost:5000/status');
+      const statusQuery = collectionId ? `?collection_id=${collectionId}` : '';
+      const statusResponse = await fetch(`http://localhost:5000/status${statusQuery}`);
       const statusData = await statusResponse.json();
       console.log("Server status:", statusData);
       
@@ -185,7 +209,7 @@ const RAGInterface = () => {
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({})
+        body: JSON.stringify({ collection_id: collectionId })
       });
       
       if (!response.ok) {
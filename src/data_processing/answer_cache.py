@@ -0,0 +1,197 @@
+from src.data_processing.cache_functions import (
+    VectorQueryCache, get_redis_client, cache_namespace, collection_generation, publish_invalidation
+)
+from src.data_processing.get_embeddings import get_embeddings
+from src.models.rerankers import normalize_query
+from collections import OrderedDict
+import threading
+import hashlib
+import atexit
+import logging
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+USE_ANSWER_CACHE = os.getenv("ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+# Optional second tier matching paraphrased questions by query embedding
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "0") == "1"
+ANSWER_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD", "0.95"))
+# Semantic tier files, one pair per prompt variant, stored next to the collection
+SEMANTIC_FILE_PREFIX = "answer_cache_"
+
+
+def answer_variant(prompt_template: str, model_params: dict) -> str:
+    """Short hash of everything besides the question that shapes an answer."""
+    params = ",".join(f"{key}={model_params[key]}" for key in sorted(model_params))
+    return hashlib.sha256(f"{prompt_template}\x00{params}".encode("utf-8")).hexdigest()[:16]
+
+
+class AnswerCache:
+    """Final LLM answers keyed by collection, prompt template, model parameters and normalized question.
+
+    Exact matches live in Redis (or a bounded in-process LRU without it); the
+    optional semantic tier keeps one VectorQueryCache per collection and variant.
+    """
+
+    def __init__(self, redis_client=None, max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS):
+        self._redis_client = redis_client
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = OrderedDict()  # key -> (answer, created_at)
+        self._generations = {}  # namespace -> generation, when Redis is unavailable
+        self._semantic = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def redis_client(self):
+        # The shared client is resolved on first use, not when this module is imported
+        return self._redis_client if self._redis_client is not None else get_redis_client()
+
+    def _generation(self, namespace):
+        if self.redis_client:
+            try:
+                value = self.redis_client.get(f"answers:{namespace}:generation")
+                return int(value) if value else 0
+            except Exception:
+                pass
+        return self._generations.get(namespace, 0)
+
+    def _key(self, chroma_path, variant, query):
+        namespace = cache_namespace(chroma_path)
+        digest = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+        # The on-disk marker carries invalidations from other processes when there is no Redis
+        generation = f"{self._generation(namespace)}.{collection_generation(chroma_path)}"
+        return f"answers:{namespace}:{generation}:{variant}:{digest}"
+
+    def _semantic_cache(self, chroma_path, variant, dimension):
+        key = (os.path.abspath(chroma_path), variant)
+        generation = collection_generation(chroma_path)
+        with self._lock:
+            cache, loaded_generation = self._semantic.get(key, (None, None))
+            if cache is not None and loaded_generation != generation:
+                cache.invalidate()
+                cache = None
+            if cache is None:
+                cache = VectorQueryCache(
+                    dimension, self.redis_client, get_embeddings(),
+                    namespace=f"{cache_namespace(chroma_path)}:answers:{variant}",
+                    persist_directory=chroma_path, file_prefix=f"{SEMANTIC_FILE_PREFIX}{variant}"
+                )
+                self._semantic[key] = (cache, generation)
+        return cache
+
+    def get(self, chroma_path, variant, query, query_embedding=None):
+        key = self._key(chroma_path, variant, query)
+        answer = None
+        if self.redis_client:
+            try:
+                value = self.redis_client.get(key)
+                answer = value.decode("utf-8") if value else None
+            except Exception as e:
+                logger.warning(f"Error reading answer cache: {str(e)}")
+        else:
+            with self._lock:
+                entry = self._local.get(key)
+                if entry and time.time() - entry[1] < self.ttl_seconds:
+                    self._local.move_to_end(key)
+                    answer = entry[0]
+                elif entry:
+                    del self._local[key]
+
+        if answer is None and ANSWER_CACHE_SEMANTIC and query_embedding is not None:
+            matches = self._semantic_cache(chroma_path, variant, len(query_embedding)).get_cached_query_result(
+                query, k=1, threshold=ANSWER_CACHE_SEMANTIC_THRESHOLD, query_embedding=query_embedding
+            )
+            answer = matches[0][0] if matches else None
+
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return answer
+
+    def put(self, chroma_path, variant, query, answer, query_embedding=None):
+        key = self._key(chroma_path, variant, query)
+        if self.redis_client:
+            try:
+                self.redis_client.set(key, answer.encode("utf-8"), ex=self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"Error writing answer cache: {str(e)}")
+        else:
+            with self._lock:
+                self._local[key] = (answer, time.time())
+                self._local.move_to_end(key)
+                while len(self._local) > self.max_entries:
+                    self._local.popitem(last=False)
+
+        if ANSWER_CACHE_SEMANTIC and query_embedding is not None:
+            self._semantic_cache(chroma_path, variant, len(query_embedding)).add_to_cache(
+                query, answer, query_embedding
+            )
+
+    def invalidate(self, chroma_path):
+        """Forget every answer for one collection by moving it to a new generation."""
+        namespace = cache_namespace(chroma_path)
+        if self.redis_client:
+            try:
+                self.redis_client.incr(f"answers:{namespace}:generation")
+            except Exception as e:
+                logger.warning(f"Error bumping answer cache generation: {str(e)}")
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            prefix = f"answers:{namespace}:"
+            for key in [key for key in self._local if key.startswith(prefix)]:
+                del self._local[key]
+            semantic = [
+                cache for (path, _), (cache, _) in self._semantic.items() if path == os.path.abspath(chroma_path)
+            ]
+        for cache in semantic:
+            cache.invalidate()
+        # Semantic caches this process never loaded exist only on disk
+        if os.path.isdir(chroma_path):
+            for filename in os.listdir(chroma_path):
+                if filename.startswith(SEMANTIC_FILE_PREFIX):
+                    try:
+                        os.remove(os.path.join(chroma_path, filename))
+                    except FileNotFoundError:
+                        pass
+
+    def save(self):
+        """Write out semantic-tier inserts still pending for collections that are current."""
+        with self._lock:
+            semantic = [
+                cache for (path, _), (cache, generation) in self._semantic.items()
+                if generation == collection_generation(path)
+            ]
+        for cache in semantic:
+            try:
+                cache.save_if_dirty()
+            except Exception as e:
+                logger.warning(f"Failed to persist answer cache for {cache.namespace}: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "local_entries": len(self._local)}
+
+
+answer_cache = AnswerCache() if USE_ANSWER_CACHE else None
+if answer_cache is not None:
+    atexit.register(answer_cache.save)
+
+
+def invalidate_answers(chroma_path):
+    """Drop cached answers for a collection whose contents changed."""
+    if answer_cache is not None:
+        answer_cache.invalidate(chroma_path)
+    publish_invalidation(chroma_path)
+
+
+def get_answer_cache_stats():
+    return answer_cache.stats() if answer_cache is not None else None
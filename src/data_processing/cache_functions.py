@@ -1,49 +1,225 @@
-from sentence_transformers import SentenceTransformer
-from scipy.spatial.distance import cosine
+from src.data_processing.get_embeddings import get_embeddings
+from collections import OrderedDict
 from typing import List, Tuple
 import numpy as np
+import threading
+import atexit
 import pickle
 import faiss
+import json
+import time
+import os
 import redis
 import logging
 
-# Initialize Redis client with error handling
-try:
-    redis_client = redis.Redis(host='localhost', port=6379, db=0)
-    # Test the connection
-    redis_client.ping()
-    redis_connected = True
-except redis.exceptions.ConnectionError:
-    logging.warning("Redis connection failed. Using fallback in-memory cache.")
-    redis_client = None
-    redis_connected = False
+_redis_lock = threading.Lock()
+_redis_client = None
+_redis_checked = False
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
+
+def get_redis_client():
+    """The shared Redis client, or None when Redis is unreachable.
+
+    Connects on first use rather than at import, so processes that merely
+    import this module (spawned worker processes included) never touch Redis.
+    """
+    global _redis_client, _redis_checked
+    with _redis_lock:
+        if not _redis_checked:
+            try:
+                client = redis.Redis(host='localhost', port=6379, db=0)
+                # Test the connection
+                client.ping()
+                _redis_client = client
+            except redis.exceptions.ConnectionError:
+                logging.warning("Redis connection failed. Using fallback in-memory cache.")
+            _redis_checked = True
+        return _redis_client
 
 # Fallback in-memory cache
 in_memory_cache = {}
 
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "86400"))
+CACHE_SIMILARITY_THRESHOLD = float(os.getenv("CACHE_SIMILARITY_THRESHOLD", "0.8"))
+
+# Files written next to a collection so its cache survives restarts
+CACHE_FILE_PREFIX = "query_cache"
+CACHE_INDEX_FILE = f"{CACHE_FILE_PREFIX}.faiss"
+CACHE_META_FILE = f"{CACHE_FILE_PREFIX}.json"
+# Inserts are persisted in batches: after this many, or once this long has passed since
+# the last save, and on invalidation and interpreter exit
+CACHE_SAVE_EVERY = int(os.getenv("CACHE_SAVE_EVERY", "50"))
+CACHE_SAVE_INTERVAL_SECONDS = float(os.getenv("CACHE_SAVE_INTERVAL_SECONDS", "60"))
+
+
 class VectorQueryCache:
-    def __init__(self, dimension: int, redis_client, model):
+    """Semantic cache over unit-normalized query vectors with LRU and TTL eviction."""
+
+    def __init__(self, dimension: int, redis_client, model, namespace: str = "default",
+                 persist_directory: str = None, file_prefix: str = CACHE_FILE_PREFIX,
+                 max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: float = CACHE_TTL_SECONDS):
         self.redis_client = redis_client
         self.model = model
-        self.index = faiss.IndexFlatL2(dimension)
-        self.query_keys = []  # To maintain the order of queries
+        self.dimension = dimension
+        self.namespace = namespace
+        self.persist_directory = persist_directory
+        self.index_file = f"{file_prefix}.faiss"
+        self.meta_file = f"{file_prefix}.json"
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Inner product over normalized vectors is cosine similarity; the ID map
+        # lets evicted entries be removed from the index
+        self.index = faiss.IndexIDMap(faiss.IndexFlatIP(dimension))
+        self.entries = OrderedDict()  # id -> (key, created_at), oldest use first
+        self.next_id = 0
         self.fallback_cache = {}  # Fallback in-memory cache
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.unsaved = 0  # inserts since the last save
+        self.last_saved = time.time()
+        self.lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self.generation = self._read_generation()
+        self.load()
+
+    def _generation_key(self):
+        return f"cache:{self.namespace}:generation"
+
+    def _read_generation(self):
+        if self.redis_client:
+            try:
+                value = self.redis_client.get(self._generation_key())
+                return int(value) if value else 0
+            except Exception:
+                pass
+        meta = self._read_meta()
+        return meta.get("generation", 0) if meta else 0
+
+    def _read_meta(self):
+        if not self.persist_directory:
+            return None
+        meta_path = os.path.join(self.persist_directory, self.meta_file)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable cache metadata {meta_path}: {str(e)}")
+            return None
 
+    def load(self):
+        """Restore the index persisted next to the collection, if it is still current."""
+        meta = self._read_meta()
+        index_path = os.path.join(self.persist_directory or "", self.index_file)
+        if not meta or not os.path.exists(index_path):
+            return
+        if meta.get("generation") != self.generation or meta.get("dimension") != self.dimension:
+            return
+        try:
+            index = faiss.read_index(index_path)
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable cache index {index_path}: {str(e)}")
+            return
+        with self.lock:
+            self.index = index
+            self.entries = OrderedDict((entry_id, (key, created_at)) for entry_id, key, created_at in meta["entries"])
+            self.next_id = meta["next_id"]
+            self._evict_expired()
+
+    def save(self):
+        """Persist the index and its key map atomically next to the collection.
+
+        Only the in-memory snapshot is taken under the cache lock; the files are
+        written after releasing it so lookups don't wait on disk I/O.
+        """
+        if not self.persist_directory or not os.path.isdir(self.persist_directory):
+            return
+        index_path = os.path.join(self.persist_directory, self.index_file)
+        meta_path = os.path.join(self.persist_directory, self.meta_file)
+        with self._save_lock:
+            with self.lock:
+                meta = {
+                    "namespace": self.namespace,
+                    "generation": self.generation,
+                    "dimension": self.dimension,
+                    "next_id": self.next_id,
+                    "entries": [[entry_id, key, created_at] for entry_id, (key, created_at) in self.entries.items()],
+                }
+                index_bytes = faiss.serialize_index(self.index)
+                self.unsaved = 0
+                self.last_saved = time.time()
+            with open(index_path + ".tmp", "wb") as f:
+                f.write(index_bytes.tobytes())
+            with open(meta_path + ".tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(index_path + ".tmp", index_path)
+            os.replace(meta_path + ".tmp", meta_path)
+
+    def save_if_dirty(self):
+        """Persist inserts not yet written by the batched saves."""
+        if self.unsaved:
+            self.save()
+
+    def _sync_generation(self):
+        """Drop local entries if another worker invalidated this namespace."""
+        if not self.redis_client:
+            return
+        generation = self._read_generation()
+        if generation != self.generation:
+            self.generation = generation
+            self.index.reset()
+            self.entries.clear()
+
+    def invalidate(self):
+        """Drop every entry by moving the namespace to a new generation."""
+        with self.lock:
+            if self.redis_client:
+                try:
+                    self.generation = int(self.redis_client.incr(self._generation_key()))
+                except Exception:
+                    self.generation += 1
+            else:
+                self.generation += 1
+            self.index.reset()
+            self.entries.clear()
+            self.fallback_cache.clear()
+            self.save()
+
+    def _encode(self, query: str, query_embedding=None):
+        if query_embedding is None:
+            query_embedding = self.model.embed_query(query)
+        vector = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1).copy()
+        faiss.normalize_L2(vector)
+        return vector
+
+    def add_to_cache(self, query: str, result: str, query_embedding=None):
+        vector = self._encode(query, query_embedding)
+
+        with self.lock:
+            self._sync_generation()
+            self._evict_expired()
+            while len(self.entries) >= self.max_entries:
+                self._evict(next(iter(self.entries)))
+
+            entry_id = self.next_id
+            self.next_id += 1
+            # Namespaced by collection and generation so restarts and other
+            # collections never collide with these keys
+            key = f"cache:{self.namespace}:{self.generation}:{entry_id}"
+            self.index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            self.entries[entry_id] = (key, time.time())
+            self.unsaved += 1
+            save_due = (self.unsaved >= CACHE_SAVE_EVERY
+                        or time.time() - self.last_saved >= CACHE_SAVE_INTERVAL_SECONDS)
 
-    def add_to_cache(self, query: str, result: str):
-        query_embedding = self.model.encode(query)
-        self.index.add(np.array([query_embedding]))
-        
-        # Generate a unique key for the query
-        key = f"query:{len(self.query_keys)}"
-        self.query_keys.append(key)
-        
         # Store the result in Redis or fallback
         if self.redis_client:
             try:
-                self.redis_client.set(key, pickle.dumps(result))
+                ttl = int(self.ttl_seconds) if self.ttl_seconds > 0 else None
+                self.redis_client.set(key, pickle.dumps(result), ex=ttl)
             except:
                 # Fallback to in-memory cache if Redis fails
                 self.fallback_cache[key] = result
@@ -51,25 +227,76 @@ class VectorQueryCache:
             # Use in-memory cache
             self.fallback_cache[key] = result
 
+        if not save_due:
+            return
+        try:
+            self.save()
+        except Exception as e:
+            logging.warning(f"Failed to persist cache for {self.namespace}: {str(e)}")
+
+    def get_cached_query_result(self, query: str, k: int = 2, threshold: float = CACHE_SIMILARITY_THRESHOLD,
+                                query_embedding=None) -> List[Tuple[str, float]]:
+        vector = self._encode(query, query_embedding)
+
+        with self.lock:
+            self._sync_generation()
+            self._evict_expired()
+            if self.index.ntotal == 0:
+                self.misses += 1
+                return []
+            similarities, ids = self.index.search(vector, min(k, self.index.ntotal))
 
-    def get_cached_query_result(self, query: str, k: int = 2, threshold: float = 0.8) -> List[Tuple[str, float]]:
-        query_embedding = self.model.encode(query)
-        
-        # Search the index
-        D, I = self.index.search(np.array([query_embedding]), k)
-        
-        results = []
-        for i, (distance, idx) in enumerate(zip(D[0], I[0])):
-            if idx != -1:  # Valid index
-                similar_query_key = self.query_keys[idx]
-                similarity = 1 - (distance / 2)  # Convert L2 distance to similarity
-                
-                if similarity >= threshold:
-                    cached_result = self.get_from_cache(similar_query_key)
-                    if cached_result:
-                        results.append((cached_result, similarity))
-        
-        return results
+            results = []
+            for similarity, entry_id in zip(similarities[0], ids[0]):
+                if entry_id == -1 or similarity < threshold or entry_id not in self.entries:
+                    continue
+                key, _ = self.entries[entry_id]
+                cached_result = self.get_from_cache(key)
+                if cached_result is None:
+                    # The backing value expired or was dropped; forget the vector too
+                    self._evict(entry_id)
+                    continue
+                self.entries.move_to_end(entry_id)
+                results.append((cached_result, float(similarity)))
+
+            if results:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return results
+
+    def _evict(self, entry_id):
+        key, _ = self.entries.pop(entry_id)
+        self.index.remove_ids(np.array([entry_id], dtype=np.int64))
+        self.fallback_cache.pop(key, None)
+        if self.redis_client:
+            try:
+                self.redis_client.delete(key)
+            except Exception:
+                pass
+        self.evictions += 1
+
+    def _evict_expired(self):
+        if self.ttl_seconds <= 0:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        expired = [entry_id for entry_id, (_, created_at) in self.entries.items() if created_at < cutoff]
+        for entry_id in expired:
+            self._evict(entry_id)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "generation": self.generation,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
 
     def get_from_cache(self, key):
         """Retrieve and unpickle a value from Redis or fallback."""
@@ -88,22 +315,23 @@ class VectorQueryCache:
                 return self.fallback_cache[key]
         return None
 
-def initialize_cache(dimension: int, redis_client, model) -> VectorQueryCache:
-    return VectorQueryCache(dimension, redis_client, model)
+def initialize_cache(dimension: int, redis_client, model, namespace: str = "default",
+                     persist_directory: str = None) -> VectorQueryCache:
+    return VectorQueryCache(dimension, redis_client, model, namespace, persist_directory)
 
 
-def store_in_cache(cache: VectorQueryCache, query: str, result: str):
+def store_in_cache(cache: VectorQueryCache, query: str, result: str, query_embedding=None):
     """Store a value in the Vector Query Cache."""
     try:
-        cache.add_to_cache(query, result)
+        cache.add_to_cache(query, result, query_embedding)
     except Exception as e:
         logging.warning(f"Failed to store in cache: {str(e)}")
 
 
-def get_cached_query_result(cache: VectorQueryCache, query: str) -> str:
+def get_cached_query_result(cache: VectorQueryCache, query: str, query_embedding=None) -> str:
     """Get a cached query result using vector similarity search."""
     try:
-        results = cache.get_cached_query_result(query)
+        results = cache.get_cached_query_result(query, query_embedding=query_embedding)
         if results:
             best_result, similarity = results[0]  # Get the most similar result
             print(f"Found cached result with similarity: {similarity:.2f}")
@@ -113,10 +341,102 @@ def get_cached_query_result(cache: VectorQueryCache, query: str) -> str:
     return None
 
 
-# Helper function to retrieve or initialize the cache
-def retrieve_or_initialize_cache():
-    # You might want to store the cache object in a global variable or in Redis itself
-    global vector_cache
-    if 'vector_cache' not in globals():
-        vector_cache = initialize_cache(384, redis_client, model)  # Adjust dimension as needed
-    return vector_cache
\ No newline at end of file
+_cache_lock = threading.Lock()
+vector_caches = {}  # collection path -> VectorQueryCache
+cache_generations = {}  # collection path -> collection_generation() the cache was loaded at
+
+# Touched whenever a collection's contents change, so every process (the server and
+# bulk_ingest.py) drops its caches of it, with or without Redis
+CACHE_GENERATION_FILE = "cache_generation"
+
+
+def collection_generation(chroma_path: str) -> int:
+    """Stamp of the last change published for the collection; 0 if there never was one."""
+    try:
+        return os.stat(os.path.join(chroma_path, CACHE_GENERATION_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def publish_invalidation(chroma_path: str):
+    """Move the collection's generation marker forward."""
+    path = os.path.join(chroma_path, CACHE_GENERATION_FILE)
+    if not os.path.isdir(chroma_path):
+        return
+    previous = collection_generation(chroma_path)
+    with open(path, "a"):
+        pass
+    # Strictly increasing, even for two changes within one clock tick
+    stamp = max(time.time_ns(), previous + 1)
+    os.utime(path, ns=(stamp, stamp))
+
+
+def cache_namespace(chroma_path: str) -> str:
+    """Collections live in per-ID directories, so the directory name is the namespace."""
+    return os.path.basename(os.path.normpath(chroma_path))
+
+
+# Helper function to retrieve or initialize the cache for one collection
+def retrieve_or_initialize_cache(chroma_path: str, dimension: int = None):
+    """Return the collection's cache; its dimension follows the query embedding model."""
+    key = os.path.abspath(chroma_path)
+    generation = collection_generation(chroma_path)
+    with _cache_lock:
+        cache = vector_caches.get(key)
+        if cache is not None and cache_generations.get(key) != generation:
+            # Another process changed the collection; don't serve (or save back) what this one holds
+            cache.invalidate()
+            cache = None
+        if cache is None:
+            model = get_embeddings()
+            if dimension is None:
+                dimension = len(model.embed_query("dimension probe"))
+            cache = initialize_cache(dimension, get_redis_client(), model, cache_namespace(chroma_path), chroma_path)
+            vector_caches[key] = cache
+            cache_generations[key] = generation
+    return cache
+
+
+def invalidate_cache(chroma_path: str):
+    """Invalidate one collection's cache without touching any other collection."""
+    key = os.path.abspath(chroma_path)
+    publish_invalidation(chroma_path)
+    with _cache_lock:
+        cache = vector_caches.pop(key, None)
+        cache_generations.pop(key, None)
+    if cache is not None:
+        cache.invalidate()
+        return
+
+    # Not loaded in this process: bump the shared generation and drop the files
+    redis_client = get_redis_client()
+    if redis_client:
+        try:
+            redis_client.incr(f"cache:{cache_namespace(chroma_path)}:generation")
+        except Exception as e:
+            logging.warning(f"Error bumping cache generation: {str(e)}")
+    for filename in (CACHE_INDEX_FILE, CACHE_META_FILE):
+        try:
+            os.remove(os.path.join(chroma_path, filename))
+        except FileNotFoundError:
+            pass
+
+
+@atexit.register
+def save_caches():
+    """Write out inserts still pending in every collection cache that is current."""
+    with _cache_lock:
+        caches = [(key, cache) for key, cache in vector_caches.items()
+                  if cache_generations.get(key) == collection_generation(key)]
+    for key, cache in caches:
+        try:
+            cache.save_if_dirty()
+        except Exception as e:
+            logging.warning(f"Failed to persist cache for {cache.namespace}: {str(e)}")
+
+
+def get_cache_stats():
+    """Hit, miss and eviction counters for every loaded collection cache."""
+    with _cache_lock:
+        caches = list(vector_caches.values())
+    return [cache.stats() for cache in caches]
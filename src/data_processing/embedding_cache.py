@@ -0,0 +1,151 @@
+from langchain_core.embeddings import Embeddings
+from src.database.file_lock import directory_lock
+from typing import List
+import numpy as np
+import threading
+import hashlib
+import logging
+import sqlite3
+import os
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'processed', 'embedding_cache')
+)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Chunk embeddings on local disk, keyed by (model name, chunk text hash).
+
+    Vectors are appended to one float32 file per model and read back through a
+    memory map; a sqlite table maps each key to its row in that file.
+    """
+
+    def __init__(self, directory: str = EMBEDDING_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS models (model TEXT PRIMARY KEY, file TEXT NOT NULL, dimension INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, row INTEGER NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._db.commit()
+        self._maps = {}  # model -> (memmap, rows)
+
+    def _model_file(self, model: str):
+        row = self._db.execute("SELECT file, dimension FROM models WHERE model = ?", (model,)).fetchone()
+        return (os.path.join(self.directory, row[0]), row[1]) if row else (None, None)
+
+    def _vectors(self, model: str, needed_rows: int):
+        """Memory map of the model's vector file, remapped when it has grown."""
+        mapped = self._maps.get(model)
+        if mapped is not None and mapped[1] >= needed_rows:
+            return mapped[0]
+        path, dimension = self._model_file(model)
+        rows = os.path.getsize(path) // (dimension * 4)
+        vectors = np.memmap(path, dtype=np.float32, mode='r', shape=(rows, dimension))
+        self._maps[model] = (vectors, rows)
+        return vectors
+
+    def get_many(self, model: str, texts: List[str]):
+        """Cached vectors for `texts`, with None where a text hasn't been embedded yet."""
+        hashes = [text_hash(text) for text in texts]
+        with self._lock:
+            rows = {}
+            unique = list(set(hashes))
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows.update(self._db.execute(
+                    f"SELECT text_hash, row FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall())
+            if not rows:
+                return [None] * len(texts)
+            vectors = self._vectors(model, max(rows.values()) + 1)
+            return [np.array(vectors[rows[h]]) if h in rows else None for h in hashes]
+
+    def put_many(self, model: str, texts: List[str], vectors):
+        """Append new vectors to the model's file and index them by text hash."""
+        if not texts:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with directory_lock(self.directory), self._lock:
+            path, dimension = self._model_file(model)
+            if path is None:
+                filename = f"{hashlib.sha1(model.encode('utf-8')).hexdigest()[:16]}.f32"
+                # Another process may have registered the model first; keep whichever row won
+                self._db.execute("INSERT OR IGNORE INTO models VALUES (?, ?, ?)", (model, filename, matrix.shape[1]))
+                self._db.commit()
+                path, dimension = self._model_file(model)
+            if matrix.shape[1] != dimension:
+                raise ValueError(f"Expected {dimension}-dimensional vectors for {model}, got {matrix.shape[1]}")
+
+            row_bytes = dimension * 4
+            with open(path, 'ab') as f:
+                f.seek(0, os.SEEK_END)
+                first_row = f.tell() // row_bytes
+                # Drop a partial row left by a writer that died mid-append
+                if f.tell() != first_row * row_bytes:
+                    f.truncate(first_row * row_bytes)
+                f.write(matrix.tobytes())
+            self._db.executemany(
+                "INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?)",
+                [(model, text_hash(text), first_row + i) for i, text in enumerate(texts)]
+            )
+            self._db.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends chunks missing from the disk cache to the model."""
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        try:
+            cached = self.cache.get_many(self.model_name, texts)
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {str(e)}")
+            cached = [None] * len(texts)
+
+        # Embed each missing text once, even if it repeats within the batch
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        if missing:
+            fresh = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            try:
+                self.cache.put_many(self.model_name, missing, [fresh[text] for text in missing])
+            except Exception as e:
+                logger.warning(f"Embedding cache write failed: {str(e)}")
+            cached = [fresh[text] if vector is None else vector for text, vector in zip(texts, cached)]
+
+        logger.info(f"Embedded {len(missing)} of {len(texts)} chunks, {len(texts) - len(missing)} from cache")
+        return [list(map(float, vector)) for vector in cached]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+    return _cache
@@ -0,0 +1,115 @@
+from src.data_processing.get_embeddings import EMBEDDING_MODEL_NAME, USE_EMBEDDING_CACHE
+from src.data_processing.embedding_cache import get_embedding_cache
+from src.models.model_registry import registry
+import threading
+import logging
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+# Worker processes for encoding; 0 encodes in the calling process
+EMBED_PROCESSES = int(os.getenv("EMBED_PROCESSES", "0"))
+
+
+class EmbeddingEngine:
+    """Batched document embedding for ingestion.
+
+    Chunks already in the disk cache are skipped, the rest are sorted by length
+    so each batch pads as little as possible, and batches are encoded either in
+    process or on a pool of worker processes (one model copy per process).
+    """
+
+    def __init__(self, batch_size: int = EMBED_BATCH_SIZE, processes: int = EMBED_PROCESSES):
+        self.batch_size = batch_size
+        self.processes = processes
+        self.last_stats = None
+        self._pool = None
+        self._lock = threading.Lock()
+        # The worker pool's queues can only serve one caller at a time
+        self._pool_lock = threading.Lock()
+
+    def embed(self, texts, on_progress=None):
+        """Embed `texts` in order, calling on_progress(done, total) after each batch."""
+        start = time.perf_counter()
+        cache = get_embedding_cache() if USE_EMBEDDING_CACHE else None
+        vectors = cache.get_many(EMBEDDING_MODEL_NAME, texts) if cache else [None] * len(texts)
+
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        missing.sort(key=len, reverse=True)
+        done = len(texts) - len(missing)
+        if on_progress:
+            on_progress(done, len(texts))
+
+        fresh = {}
+        step = self.batch_size * max(self.processes, 1)
+        for offset in range(0, len(missing), step):
+            batch = missing[offset:offset + step]
+            batch_vectors = self._encode(batch)
+            fresh.update(zip(batch, batch_vectors))
+            if cache:
+                cache.put_many(EMBEDDING_MODEL_NAME, batch, batch_vectors)
+            done += len(batch)
+            if on_progress:
+                on_progress(done, len(texts))
+
+        vectors = [fresh[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+
+        seconds = time.perf_counter() - start
+        self.last_stats = {
+            "chunks": len(texts),
+            "embedded": len(missing),
+            "cached": len(texts) - len(missing),
+            "seconds": round(seconds, 3),
+            "chunks_per_second": round(len(texts) / seconds, 1) if seconds > 0 else None,
+        }
+        logger.info(
+            f"Embedded {len(texts)} chunks ({len(missing)} new) in {seconds:.2f}s, "
+            f"{self.last_stats['chunks_per_second']} chunks/s"
+        )
+        return [list(map(float, vector)) for vector in vectors]
+
+    def _encode(self, texts):
+        embeddings = registry.get(EMBEDDING_MODEL_NAME)
+        client = getattr(embeddings, "client", None) or getattr(embeddings, "_client", None)
+        if client is None:
+            return embeddings.embed_documents(texts)
+
+        # Same preprocessing and encode options HuggingFaceEmbeddings applies
+        texts = [text.replace("\n", " ") for text in texts]
+        encode_kwargs = {**getattr(embeddings, "encode_kwargs", {}), "batch_size": self.batch_size}
+        if self.processes > 0:
+            encode_kwargs.pop("show_progress_bar", None)
+            with self._pool_lock:
+                return client.encode_multi_process(texts, self._get_pool(client), **encode_kwargs).tolist()
+        return client.encode(texts, **encode_kwargs).tolist()
+
+    def _get_pool(self, client):
+        with self._lock:
+            if self._pool is None:
+                self._pool = client.start_multi_process_pool(target_devices=["cpu"] * self.processes)
+                self._pool_client = client
+            return self._pool
+
+    def close(self):
+        """Stop the worker processes, if any were started."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool_client.stop_multi_process_pool(self._pool)
+                self._pool = None
+                self._pool_client = None
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_embedding_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = EmbeddingEngine()
+            # The worker pool holds the model; stop it when the model is unloaded
+            registry.on_unload(EMBEDDING_MODEL_NAME, _engine.close)
+    return _engine
@@ -3,7 +3,10 @@
 # from transformers import BertTokenizer, BertModel
 # from langchain.embeddings.base import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
+from src.data_processing.embedding_cache import CachedEmbeddings, get_embedding_cache
+from src.models.model_registry import registry
 from dotenv import load_dotenv
+import numpy as np
 import os
 
         
@@ -26,12 +29,51 @@ embedding_model = model4
 
 """
 
-def get_embeddings(text=None):
-    embeddings = HuggingFaceEmbeddings(
-        model_name="nomic-ai/nomic-embed-text-v1",
+# The same model embeds stored chunks, the semantic cache and retrieval queries,
+# so query vectors can be shared between the cache lookup and the Chroma search
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "nomic-ai/nomic-embed-text-v1")
+
+
+def _load_embeddings():
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
         model_kwargs={"trust_remote_code": True}
     )
-    return embeddings
+
+
+registry.register(EMBEDDING_MODEL_NAME, _load_embeddings)
+
+# Chunk embeddings are reused from disk unless EMBEDDING_CACHE=0
+USE_EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "1") == "1"
+
+
+def get_embeddings(text=None):
+    """Return the shared embedding model, loading its weights only once per process.
+
+    Document embeddings go through the on-disk chunk cache, so only chunks that
+    were never embedded with this model reach it.
+    """
+    # A proxy, so callers that keep it don't pin the weights after an unload
+    embeddings = registry.proxy(EMBEDDING_MODEL_NAME)
+    if not USE_EMBEDDING_CACHE:
+        return embeddings
+    return CachedEmbeddings(embeddings, EMBEDDING_MODEL_NAME, get_embedding_cache())
+
+
+def embed_query(query):
+    """Embed a query once so every stage of the request can reuse the vector."""
+    return np.asarray(get_embeddings().embed_query(query), dtype=np.float32)
+
+
+def embed_queries(queries):
+    """Embed several queries in one forward pass; row i is embed_query(queries[i]).
+
+    Goes to the model directly: query vectors don't belong in the chunk cache.
+    """
+    if not queries:
+        return []
+    vectors = registry.get(EMBEDDING_MODEL_NAME).embed_documents(list(queries))
+    return [np.asarray(vector, dtype=np.float32) for vector in vectors]
 
 # (1, 8, 1024)
 
@@ -0,0 +1,117 @@
+from collections import OrderedDict
+import threading
+import logging
+import queue
+import time
+import uuid
+import os
+
+logger = logging.getLogger(__name__)
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+INGESTION_QUEUE_SIZE = int(os.getenv("INGESTION_QUEUE_SIZE", "32"))
+# Finished jobs kept around for status polling
+INGESTION_JOB_HISTORY = int(os.getenv("INGESTION_JOB_HISTORY", "1000"))
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue cannot accept more jobs."""
+
+
+class IngestionJob:
+    def __init__(self, **info):
+        self.id = str(uuid.uuid4())
+        self.info = info
+        self.stage = "queued"
+        self.progress = 0.0
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def update(self, stage: str, progress: float = None):
+        """Record the stage the job is in and, optionally, progress within it (0-1)."""
+        self.stage = stage
+        if progress is not None:
+            self.progress = round(min(max(progress, 0.0), 1.0), 3)
+
+    @property
+    def done(self):
+        return self.stage in ("done", "failed")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            **self.info,
+            "stage": self.stage,
+            "progress": self.progress,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionQueue:
+    """Bounded queue of ingestion jobs served by a fixed pool of worker threads."""
+
+    def __init__(self, workers: int = INGESTION_WORKERS, max_queued: int = INGESTION_QUEUE_SIZE):
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"ingestion-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, fn, *args, **info):
+        """Queue `fn(job, *args)`; raises QueueFullError instead of blocking."""
+        self.start()
+        job = IngestionJob(**info)
+        try:
+            self._queue.put_nowait((job, fn, args))
+        except queue.Full:
+            raise QueueFullError(f"Ingestion queue is full ({self._queue.maxsize} jobs waiting)")
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim_history()
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(len(self._jobs) - INGESTION_JOB_HISTORY, 0)]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job, fn, args = self._queue.get()
+            job.started_at = time.time()
+            try:
+                job.result = fn(job, *args)
+                job.update("done", 1.0)
+            except Exception as e:
+                logger.error(f"Ingestion job {job.id} failed during {job.stage}: {str(e)}")
+                job.error = str(e)
+                job.stage = "failed"
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,114 @@
+from concurrent.futures import ProcessPoolExecutor, Future
+from langchain.schema.document import Document
+import multiprocessing
+import threading
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for page text extraction; 0 extracts in the calling process
+PDF_EXTRACT_PROCESSES = int(os.getenv("PDF_EXTRACT_PROCESSES", str(min(4, os.cpu_count() or 1))))
+# Shorter PDFs are parsed in process; a one-page CV doesn't repay the hand-off
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "4"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Per worker process: the last PDF opened, so its pages don't each re-parse the file.
+# Keyed by file stamp, so a resume re-uploaded under the same name is read afresh.
+_reader = (None, None)
+
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def _extract_page(stamp, page_number):
+    global _reader
+    from pypdf import PdfReader
+    if _reader[0] != stamp:
+        _reader = (stamp, PdfReader(stamp[0]))
+    return _reader[1].pages[page_number].extract_text()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the server forks from a process running worker threads
+            _pool = ProcessPoolExecutor(PDF_EXTRACT_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def extract_pdf_pages(paths, on_page_count=None):
+    """Yield one Document per page of each PDF in `paths`, in order, as soon as it is extracted.
+
+    Pages of long (or many) PDFs are parsed in a process pool running ahead of
+    the consumer, so splitting and embedding overlap with extraction. Metadata
+    matches PyPDFLoader's ("source", zero-based "page"). on_page_count(total)
+    is called once the files are opened, before the first page is yielded.
+    """
+    from pypdf import PdfReader
+    readers = [(path, PdfReader(path)) for path in paths]
+    total_pages = sum(len(reader.pages) for _, reader in readers)
+    if on_page_count:
+        on_page_count(total_pages)
+    if PDF_EXTRACT_PROCESSES <= 0 or total_pages < PDF_PARALLEL_MIN_PAGES:
+        # Readers belong to this call, so concurrent ingestion threads never share one
+        for path, reader in readers:
+            for page_number, page in enumerate(reader.pages):
+                yield Document(page_content=page.extract_text() or "", metadata={"source": path, "page": page_number})
+        return
+
+    pages = [
+        (_file_stamp(path), page_number)
+        for path, reader in readers for page_number in range(len(reader.pages))
+    ]
+    # map() submits every page up front and yields results in page order
+    texts = _get_pool().map(
+        _extract_page,
+        [stamp for stamp, _ in pages],
+        [page_number for _, page_number in pages],
+        chunksize=max(1, len(pages) // (PDF_EXTRACT_PROCESSES * 4)),
+    )
+    for (stamp, page_number), text in zip(pages, texts):
+        yield Document(page_content=text or "", metadata={"source": stamp[0], "page": page_number})
+
+
+def _extract_file(path):
+    from pypdf import PdfReader
+    return [page.extract_text() or "" for page in PdfReader(path).pages]
+
+
+def submit_pdf(path):
+    """Future for the page texts of a whole PDF, parsed on the worker pool.
+
+    Bulk ingestion parses many short PDFs, so it spreads whole files over the
+    workers instead of the pages of one file.
+    """
+    if PDF_EXTRACT_PROCESSES <= 0:
+        future = Future()
+        try:
+            future.set_result(_extract_file(path))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return _get_pool().submit(_extract_file, path)
+
+
+def pdf_paths(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(".pdf")
+    )
+
+
+def shutdown():
+    """Stop the worker processes, if any were started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
@@ -0,0 +1,84 @@
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.schema.document import Document
+from typing import Iterable, Iterator, List
+import re
+import os
+
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+# Sections are natural boundaries, so chunks only need a little overlap within one
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+
+# Text before the first heading: name, contact details, links
+HEADER_SECTION = "header"
+
+# Canonical section -> headings resumes commonly use for it
+SECTION_HEADINGS = {
+    "summary": ["summary", "professional summary", "profile", "professional profile", "objective",
+                "career objective", "about", "about me"],
+    "experience": ["experience", "work experience", "professional experience", "employment",
+                   "employment history", "work history", "career history", "relevant experience"],
+    "education": ["education", "academic background", "education and training", "academics",
+                  "qualifications", "academic qualifications"],
+    "skills": ["skills", "technical skills", "core skills", "key skills", "core competencies",
+               "competencies", "technologies", "tools and technologies", "skills and tools"],
+    "projects": ["projects", "personal projects", "selected projects", "key projects", "academic projects"],
+    "certifications": ["certifications", "certificates", "licenses and certifications",
+                       "courses", "training"],
+    "publications": ["publications", "research", "papers"],
+    "awards": ["awards", "honors", "honors and awards", "achievements", "accomplishments"],
+    "languages": ["languages"],
+    "volunteering": ["volunteering", "volunteer experience", "volunteer work", "leadership", "activities",
+                     "extracurricular activities"],
+    "interests": ["interests", "hobbies", "hobbies and interests"],
+    "references": ["references"],
+}
+SECTIONS = [HEADER_SECTION] + list(SECTION_HEADINGS)
+
+_HEADING_LOOKUP = {heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings}
+
+
+def detect_section(line: str):
+    """The canonical section a line is a heading for, or None for body text."""
+    candidate = re.sub(r"[\s:|•\-–—_=*#]+$", "", line.strip()).strip(" :|•-–—_=*#")
+    if not candidate or len(candidate) > 40:
+        return None
+    return _HEADING_LOOKUP.get(re.sub(r"\s+", " ", candidate.lower().replace("&", "and")))
+
+
+def split_into_sections(documents: Iterable[Document]) -> Iterator[Document]:
+    """One Document per (page, section) run of text, with `section` in its metadata.
+
+    The current section carries over page breaks within the same source, since
+    a long Experience section usually continues on the next page. Pages are
+    consumed one at a time, so this can run while later pages are still being
+    extracted.
+    """
+    current = {}  # source -> section in effect at the end of its last page
+    for document in documents:
+        source = document.metadata.get("source")
+        runs = [(current.get(source, HEADER_SECTION), [])]
+        for line in document.page_content.splitlines():
+            section = detect_section(line)
+            if section is not None:
+                runs.append((section, []))
+            # The heading stays with its content; it tells the LLM what it is reading
+            runs[-1][1].append(line)
+        current[source] = runs[-1][0]
+
+        for section, lines in runs:
+            text = "\n".join(lines).strip()
+            if text:
+                yield Document(page_content=text, metadata={**document.metadata, "section": section})
+
+
+def iter_resume_chunks(documents: Iterable[Document], chunk_size: int = CHUNK_SIZE,
+                       chunk_overlap: int = CHUNK_OVERLAP) -> Iterator[Document]:
+    """Split on section boundaries first, then split long sections into chunks of raw text."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for block in split_into_sections(documents):
+        yield from splitter.split_documents([block])
+
+
+def chunk_resume(documents: Iterable[Document], chunk_size: int = CHUNK_SIZE,
+                 chunk_overlap: int = CHUNK_OVERLAP) -> List[Document]:
+    return list(iter_resume_chunks(documents, chunk_size, chunk_overlap))
@@ -0,0 +1,69 @@
+from src.prompts.prompts import STRUCTURED_CV_RESUME_TEMPLATE, INTERVIEW_QUESTIONS_PROMPT
+from src.models.models import llama_groq, llama_groq_structured
+from src.database.chroma_handles import handle_pool
+from src.data_processing.get_embeddings import get_embeddings
+import logging
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# Stored next to the collection, like the query cache files
+INSIGHTS_FILE = "insights.json"
+# Resume text sent to the LLM, kept well inside llama3-70b-8192's context window
+INSIGHTS_MAX_CHARS = int(os.getenv("INSIGHTS_MAX_CHARS", "20000"))
+
+INTERVIEW_QUESTIONS_QUERY = "Generate 5 specific interview questions based on my resume"
+
+
+def collection_text(chroma_path):
+    """The collection's chunk texts in page order, truncated to INSIGHTS_MAX_CHARS."""
+    with handle_pool.lease(chroma_path, get_embeddings()) as chroma_db:
+        stored = chroma_db._collection.get(include=["documents", "metadatas"])
+    entries = sorted(
+        zip(stored["documents"], stored["metadatas"]),
+        key=lambda entry: ((entry[1] or {}).get("source", ""), (entry[1] or {}).get("page", 0))
+    )
+    return "\n\n".join(text.strip() for text, _ in entries if text)[:INSIGHTS_MAX_CHARS]
+
+
+def generate_insights(chroma_path):
+    """Generate the structured summary and interview questions once and store them with the collection."""
+    context = collection_text(chroma_path)
+    if not context:
+        raise ValueError("Collection has no content to summarize")
+
+    insights = {
+        "summary": llama_groq_structured(STRUCTURED_CV_RESUME_TEMPLATE.format(context=context)),
+        "interview_questions": llama_groq(
+            INTERVIEW_QUESTIONS_QUERY, INTERVIEW_QUESTIONS_PROMPT.format(context=context)
+        ),
+        "generated_at": time.time(),
+    }
+    path = os.path.join(chroma_path, INSIGHTS_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(insights, f)
+    os.replace(path + ".tmp", path)
+    return insights
+
+
+def load_insights(chroma_path):
+    """Previously generated insights for a collection, or None."""
+    path = os.path.join(chroma_path, INSIGHTS_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable insights file {path}: {str(e)}")
+        return None
+
+
+def get_insights(chroma_path, refresh=False):
+    """Stored insights for a collection, generating them if missing or when `refresh` is set."""
+    insights = None if refresh else load_insights(chroma_path)
+    if insights is None:
+        insights = generate_insights(chroma_path)
+    return insights
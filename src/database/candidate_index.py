@@ -0,0 +1,388 @@
+from src.data_processing.get_embeddings import get_embeddings
+from src.database.chroma_handles import handle_pool
+from src.database.file_lock import directory_lock
+import numpy as np
+import threading
+import logging
+import sqlite3
+import faiss
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_DIR = os.getenv(
+    "SEARCH_INDEX_DIR",
+    os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'processed', 'search_index')
+)
+# HNSW graph degree and build-time beam width; changing either needs a rebuild
+SEARCH_HNSW_M = int(os.getenv("SEARCH_HNSW_M", "32"))
+SEARCH_HNSW_EF_CONSTRUCTION = int(os.getenv("SEARCH_HNSW_EF_CONSTRUCTION", "200"))
+# Query-time beam width: higher finds more of the true nearest chunks, slower
+SEARCH_HNSW_EF_SEARCH = int(os.getenv("SEARCH_HNSW_EF_SEARCH", "64"))
+# Recall-versus-latency presets for /search: ef_search and chunk hits fetched per resume returned
+RECALL_PRESETS = {
+    "fast": {"ef_search": 32, "oversample": 4},
+    "balanced": {"ef_search": SEARCH_HNSW_EF_SEARCH, "oversample": 8},
+    "high": {"ef_search": 256, "oversample": 16},
+}
+SEARCH_MAX_TOP_K = 100
+SEARCH_MAX_EF = 1024
+# Chroma get() batch size when pulling stored vectors into the index
+FETCH_BATCH = 5000
+
+# Chunks held in the exact delta index before the server merges them into the HNSW graph
+SEARCH_DELTA_MAX_VECTORS = int(os.getenv("SEARCH_DELTA_MAX_VECTORS", "5000"))
+
+MAIN_INDEX_FILE = "hnsw.faiss"
+# Append-only: an (int64 generation, int64 dimension) header, then one (int64 id, float32 vector)
+# record per chunk. Compaction replaces the log with a fresh header of a later generation,
+# which tells readers to drop what they read from the old one.
+DELTA_LOG_FILE = "delta.log"
+DELTA_HEADER = np.dtype([("generation", np.int64), ("dimension", np.int64)])
+
+
+class CandidateIndex:
+    """One approximate nearest-neighbor index over the chunks of every collection.
+
+    Bulk loads are merged into an HNSW graph by compact(); chunks ingested one
+    resume at a time are appended to a small exact "delta" index, so an upload
+    never rewrites the large graph, and merged in the background once the delta
+    holds SEARCH_DELTA_MAX_VECTORS chunks. A sqlite table maps vector IDs
+    to (collection, resume, chunk); removals are tombstones there, filtered at
+    query time and dropped when the graph is rebuilt. Chroma stays the source of
+    truth for the vectors themselves.
+    """
+
+    def __init__(self, directory: str = SEARCH_INDEX_DIR, m: int = SEARCH_HNSW_M,
+                 ef_construction: int = SEARCH_HNSW_EF_CONSTRUCTION):
+        self.directory = directory
+        self.m = m
+        self.ef_construction = ef_construction
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "chunks.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL, collection_id TEXT NOT NULL, chroma_path TEXT NOT NULL, "
+            "resume_id TEXT NOT NULL, section TEXT, filename TEXT, "
+            "indexed INTEGER NOT NULL DEFAULT 0, deleted INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_collection ON chunks (collection_id, resume_id)")
+        self._db.commit()
+        self._loaded = {}  # file name -> (mtime, faiss index)
+        self._delta = None  # exact index over the delta log, kept in memory
+        self._delta_log = (None, 0)  # (generation, bytes) of the log the delta was read from
+        self._compacting = False
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _index(self, name):
+        """The index stored in `name`, reloaded when another process has rewritten it."""
+        path = self._path(name)
+        if not os.path.exists(path):
+            self._loaded.pop(name, None)
+            return None
+        mtime = os.stat(path).st_mtime_ns
+        loaded = self._loaded.get(name)
+        if loaded is None or loaded[0] != mtime:
+            loaded = (mtime, faiss.read_index(path))
+            self._loaded[name] = loaded
+        return loaded[1]
+
+    def _read(self, name):
+        # A private copy to modify; searches keep using the loaded one until it is replaced
+        path = self._path(name)
+        return faiss.read_index(path) if os.path.exists(path) else None
+
+    def _save(self, name, index):
+        path = self._path(name)
+        faiss.write_index(index, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self._loaded[name] = (os.stat(path).st_mtime_ns, index)
+
+    def _new_hnsw(self, dimension):
+        hnsw = faiss.IndexHNSWFlat(dimension, self.m, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = self.ef_construction
+        return faiss.IndexIDMap(hnsw)
+
+    def record(self, chroma_path, chunk_ids, metadatas):
+        """Register chunks stored in the collection at `chroma_path`; returns their vector IDs.
+
+        They become searchable once added to the delta index or compacted. A
+        single-resume collection's chunks without a resume_id use the collection ID.
+        """
+        chroma_path = os.path.abspath(chroma_path)
+        collection_id = collection_id_for(chroma_path)
+        with self._lock:
+            ids = []
+            for chunk_id, metadata in zip(chunk_ids, metadatas):
+                metadata = metadata or {}
+                cursor = self._db.execute(
+                    "INSERT INTO chunks (chunk_id, collection_id, chroma_path, resume_id, section, filename) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (chunk_id, collection_id, chroma_path, metadata.get("resume_id") or collection_id,
+                     metadata.get("section"), metadata.get("filename") or os.path.basename(metadata.get("source") or "")),
+                )
+                ids.append(cursor.lastrowid)
+            self._db.commit()
+        return ids
+
+    def _sync_delta(self):
+        """The in-memory delta index, extended with records appended to the log since it was read.
+
+        Call with self._lock held; a log of another generation, i.e. one a
+        compaction replaced, is read again from the start.
+        """
+        try:
+            with open(self._path(DELTA_LOG_FILE), 'rb') as f:
+                header = _read_header(f)
+                size = os.fstat(f.fileno()).st_size
+                if header is None:
+                    self._delta, self._delta_log = None, (None, 0)
+                    return None
+                generation, dimension = header
+                logged_generation, offset = self._delta_log
+                if generation != logged_generation or size < offset:
+                    self._delta, offset = None, 0
+                if self._delta is None:
+                    self._delta = faiss.IndexIDMap(faiss.IndexFlatIP(dimension))
+                record_size = _record_dtype(dimension).itemsize
+                start = max(offset, DELTA_HEADER.itemsize)
+                count = (size - start) // record_size
+                if count:
+                    f.seek(start)
+                    records = np.frombuffer(f.read(count * record_size), dtype=_record_dtype(dimension))
+                    self._delta.add_with_ids(np.ascontiguousarray(records["vector"]), np.ascontiguousarray(records["id"]))
+        except FileNotFoundError:
+            self._delta, self._delta_log = None, (None, 0)
+            return None
+        self._delta_log = (generation, start + count * record_size)
+        return self._delta
+
+    def add(self, chroma_path, chunk_ids, vectors, metadatas):
+        """Register chunks and make them searchable right away through the delta index."""
+        ids = self.record(chroma_path, chunk_ids, metadatas)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        dimension = vectors.shape[1]
+        records = np.empty(len(ids), dtype=_record_dtype(dimension))
+        records["id"] = ids
+        records["vector"] = vectors
+        with directory_lock(self.directory):
+            # Only the new records are written; the delta so far stays where it is
+            with open(self._path(DELTA_LOG_FILE), 'a+b') as f:
+                f.seek(0)
+                header = _read_header(f)
+                if header is None:
+                    f.truncate(0)
+                    f.write(_header_bytes(time.time_ns(), dimension))
+                else:
+                    _, logged_dimension = header
+                    if logged_dimension != dimension:
+                        raise ValueError(f"Expected {logged_dimension}-dimensional vectors, got {dimension}")
+                    # Drop a partial record left by a writer that died mid-append
+                    size = f.seek(0, os.SEEK_END)
+                    end = DELTA_HEADER.itemsize + (size - DELTA_HEADER.itemsize) // records.itemsize * records.itemsize
+                    if size != end:
+                        f.truncate(end)
+                f.write(records.tobytes())
+            with self._lock:
+                delta = self._sync_delta()
+        if delta is not None and delta.ntotal >= SEARCH_DELTA_MAX_VECTORS:
+            self.compact_in_background()
+
+    def compact_in_background(self):
+        """Run compact() on a daemon thread, unless one is already running."""
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Search index compaction failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._compacting = False
+
+        threading.Thread(target=run, name="search-index-compaction", daemon=True).start()
+
+    def remove(self, collection_id, resume_ids=None):
+        """Tombstone a collection's chunks, or only those of some resumes in it."""
+        with self._lock:
+            if resume_ids is None:
+                self._db.execute("UPDATE chunks SET deleted = 1 WHERE collection_id = ?", (collection_id,))
+            else:
+                self._db.executemany(
+                    "UPDATE chunks SET deleted = 1 WHERE collection_id = ? AND resume_id = ?",
+                    [(collection_id, resume_id) for resume_id in resume_ids],
+                )
+            self._db.commit()
+
+    def compact(self):
+        """Merge every chunk not yet in the HNSW graph into it, reading vectors back from Chroma."""
+        with directory_lock(self.directory):
+            with self._lock:
+                pending = self._db.execute(
+                    "SELECT id, chunk_id, chroma_path FROM chunks WHERE indexed = 0 AND deleted = 0 ORDER BY id"
+                ).fetchall()
+            if not pending:
+                return 0
+            main = self._read(MAIN_INDEX_FILE)
+
+            by_collection = {}
+            for row_id, chunk_id, chroma_path in pending:
+                by_collection.setdefault(chroma_path, []).append((row_id, chunk_id))
+            added = 0
+            for chroma_path, rows in by_collection.items():
+                if not os.path.isdir(chroma_path):
+                    continue
+                for start in range(0, len(rows), FETCH_BATCH):
+                    batch = dict((chunk_id, row_id) for row_id, chunk_id in rows[start:start + FETCH_BATCH])
+                    with handle_pool.lease(chroma_path, get_embeddings()) as chroma_db:
+                        stored = chroma_db._collection.get(ids=list(batch), include=["embeddings"])
+                    if not stored["ids"]:
+                        continue
+                    vectors = np.asarray(stored["embeddings"], dtype=np.float32)
+                    faiss.normalize_L2(vectors)
+                    if main is None:
+                        main = self._new_hnsw(vectors.shape[1])
+                    main.add_with_ids(vectors, np.asarray([batch[chunk_id] for chunk_id in stored["ids"]], dtype=np.int64))
+                    added += len(stored["ids"])
+
+            with self._lock:
+                if main is not None:
+                    self._save(MAIN_INDEX_FILE, main)
+                self._db.executemany("UPDATE chunks SET indexed = 1 WHERE id = ?", [(row[0],) for row in pending])
+                self._db.commit()
+                # Everything the delta held is in the graph now: start the log's next generation
+                self._reset_delta_log()
+        logger.info(f"Merged {added} chunks into the search index")
+        return added
+
+    def _reset_delta_log(self):
+        path = self._path(DELTA_LOG_FILE)
+        try:
+            with open(path, 'rb') as f:
+                header = _read_header(f)
+        except FileNotFoundError:
+            header = None
+        if header is not None:
+            generation, dimension = header
+            with open(path + ".tmp", 'wb') as f:
+                # Later than the old generation even if the clock stepped back
+                f.write(_header_bytes(max(time.time_ns(), generation + 1), dimension))
+            os.replace(path + ".tmp", path)
+        self._delta, self._delta_log = None, (None, 0)
+
+    def rebuild(self):
+        """Rebuild the graph from scratch, e.g. after changing M or ef_construction; drops tombstones."""
+        with directory_lock(self.directory), self._lock:
+            self._db.execute("DELETE FROM chunks WHERE deleted = 1")
+            self._db.execute("UPDATE chunks SET indexed = 0")
+            self._db.commit()
+            if os.path.exists(self._path(MAIN_INDEX_FILE)):
+                os.remove(self._path(MAIN_INDEX_FILE))
+            self._loaded.pop(MAIN_INDEX_FILE, None)
+        return self.compact()
+
+    def search(self, query_vector, top_k=10, ef_search=SEARCH_HNSW_EF_SEARCH, oversample=8, section=None):
+        """Best-matching resumes, each with its chunk hits, highest-scoring resume first."""
+        query = np.asarray([query_vector], dtype=np.float32)
+        faiss.normalize_L2(query)
+        k = top_k * oversample
+        hits = []
+        with self._lock:
+            main = self._index(MAIN_INDEX_FILE)
+            # The delta is extended in place, so it is searched under the lock
+            delta = self._sync_delta()
+            if delta is not None and delta.ntotal:
+                scores, ids = delta.search(query, min(k, delta.ntotal))
+                hits.extend(zip(ids[0], scores[0]))
+        if main is not None and main.ntotal:
+            params = faiss.SearchParametersHNSW(efSearch=max(ef_search, k))
+            scores, ids = main.search(query, min(k, main.ntotal), params=params)
+            hits.extend(zip(ids[0], scores[0]))
+        hits = [(int(row_id), float(score)) for row_id, score in hits if row_id >= 0]
+        if not hits:
+            return []
+
+        scores = dict(hits)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, chunk_id, collection_id, resume_id, section, filename FROM chunks "
+                f"WHERE deleted = 0 AND id IN ({','.join('?' * len(scores))})",
+                list(scores),
+            ).fetchall()
+
+        # Aggregate chunk hits per resume; a resume ranks by its best chunk
+        candidates = {}
+        for row_id, chunk_id, collection_id, resume_id, chunk_section, filename in rows:
+            if section and chunk_section != section:
+                continue
+            candidate = candidates.setdefault((collection_id, resume_id), {
+                "resume_id": resume_id,
+                "collection_id": collection_id,
+                "filename": filename,
+                "score": float("-inf"),
+                "hits": [],
+            })
+            candidate["score"] = max(candidate["score"], scores[row_id])
+            candidate["hits"].append({"chunk_id": chunk_id, "section": chunk_section, "score": round(scores[row_id], 4)})
+
+        ranked = sorted(candidates.values(), key=lambda c: (c["score"], len(c["hits"])), reverse=True)[:top_k]
+        for candidate in ranked:
+            candidate["score"] = round(candidate["score"], 4)
+            candidate["hits"].sort(key=lambda hit: hit["score"], reverse=True)
+        return ranked
+
+    def stats(self):
+        with self._lock:
+            main, delta = self._index(MAIN_INDEX_FILE), self._sync_delta()
+            pending, = self._db.execute("SELECT COUNT(*) FROM chunks WHERE indexed = 0 AND deleted = 0").fetchone()
+        return {
+            "hnsw_vectors": main.ntotal if main is not None else 0,
+            "delta_vectors": delta.ntotal if delta is not None else 0,
+            "not_in_hnsw": pending,
+            "m": self.m,
+            "ef_construction": self.ef_construction,
+            "ef_search": SEARCH_HNSW_EF_SEARCH,
+            "compacting": self._compacting,
+        }
+
+
+def _read_header(f):
+    """(generation, dimension) of the delta log open as `f`, or None if it has no header yet."""
+    header = f.read(DELTA_HEADER.itemsize)
+    if len(header) < DELTA_HEADER.itemsize:
+        return None
+    header = np.frombuffer(header, dtype=DELTA_HEADER)[0]
+    return int(header["generation"]), int(header["dimension"])
+
+
+def _header_bytes(generation, dimension):
+    return np.array([(generation, dimension)], dtype=DELTA_HEADER).tobytes()
+
+
+def _record_dtype(dimension):
+    return np.dtype([("id", np.int64), ("vector", np.float32, (dimension,))])
+
+
+def collection_id_for(chroma_path):
+    return os.path.basename(os.path.normpath(chroma_path))
+
+
+_candidate_index = None
+_candidate_index_lock = threading.Lock()
+
+
+def get_candidate_index():
+    global _candidate_index
+    with _candidate_index_lock:
+        if _candidate_index is None:
+            _candidate_index = CandidateIndex()
+    return _candidate_index
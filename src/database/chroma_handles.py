@@ -0,0 +1,178 @@
+from langchain_community.vectorstores import Chroma
+from contextlib import contextmanager
+from collections import OrderedDict
+import threading
+import logging
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+MAX_OPEN_HANDLES = int(os.getenv("CHROMA_MAX_OPEN_HANDLES", "16"))
+HANDLE_IDLE_SECONDS = float(os.getenv("CHROMA_HANDLE_IDLE_SECONDS", "900"))
+
+
+class _Entry:
+    """A pooled handle and the leases currently holding it."""
+
+    def __init__(self):
+        self.handle = None
+        self.error = None
+        self.ready = threading.Event()  # set once the handle is open (or failed to open)
+        self.closed = threading.Event()
+        self.leases = 0
+        self.last_used = time.monotonic()
+        self.retired = False  # evicted or closed; stopped when its last lease is released
+
+
+class ChromaHandlePool:
+    """LRU of open Chroma collection clients keyed by persist directory.
+
+    Callers hold a handle through lease(); a handle is only stopped once no
+    lease holds it, so eviction never pulls a client out from under a query.
+    """
+
+    def __init__(self, max_size: int = MAX_OPEN_HANDLES, idle_seconds: float = HANDLE_IDLE_SECONDS):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self._handles = OrderedDict()  # path -> _Entry
+        self._retiring = {}  # path -> retired _Entry still held by a lease
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def lease(self, path: str, embedding_function):
+        """Hold the open handle for `path`, opening it on first use, for the duration of the block."""
+        key = os.path.abspath(path)
+        entry = self._acquire(key, path, embedding_function)
+        try:
+            yield entry.handle
+        finally:
+            self._release(key, entry)
+
+    def _acquire(self, key, path, embedding_function):
+        with self._lock:
+            to_close = self._evict_idle()
+            entry = self._handles.get(key)
+            opening = entry is None
+            if opening:
+                # Placeholder, so other lookups for this path wait for it instead of opening their own
+                entry = _Entry()
+                self._handles[key] = entry
+                retiring = self._retiring.get(key)
+            entry.leases += 1
+            entry.last_used = time.monotonic()
+            self._handles.move_to_end(key)
+        self._close_all(to_close)
+
+        if not opening:
+            entry.ready.wait()
+            if entry.error is not None:
+                self._release(key, entry)
+                raise entry.error
+            return entry
+
+        try:
+            # Chroma shares one system per directory; let a retired client of it stop first
+            if retiring is not None:
+                retiring.closed.wait()
+            entry.handle = Chroma(persist_directory=path, embedding_function=embedding_function)
+        except Exception as e:
+            entry.error = e
+            with self._lock:
+                if self._handles.get(key) is entry:
+                    del self._handles[key]
+                if self._retiring.get(key) is entry:
+                    del self._retiring[key]
+                entry.leases -= 1
+            entry.ready.set()
+            entry.closed.set()
+            raise
+        entry.ready.set()
+        with self._lock:
+            to_close = self._evict_over_capacity()
+        self._close_all(to_close)
+        return entry
+
+    def _release(self, key, entry):
+        with self._lock:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+            close = entry.retired and entry.leases == 0 and entry.handle is not None
+            if close:
+                self._retiring.pop(key, None)
+        if close:
+            self._close_all([(key, entry)])
+
+    def _retire(self, key, entry):
+        """Take `entry` out of the pool; returns it if it can be stopped now. Call with the lock held."""
+        entry.retired = True
+        if entry.leases == 0 and entry.handle is not None:
+            return [(key, entry)]
+        if entry.handle is not None or entry.leases:
+            self._retiring[key] = entry
+        return []
+
+    def _close_all(self, entries):
+        for key, entry in entries:
+            _close_handle(key, entry.handle)
+            entry.closed.set()
+
+    def close(self, path: str) -> bool:
+        """Close and forget the handle for `path`, if one is open (once its leases are released)."""
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._handles.pop(key, None)
+            to_close = self._retire(key, entry) if entry is not None else []
+        self._close_all(to_close)
+        return entry is not None
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._handles.items())
+            self._handles.clear()
+            to_close = [closing for key, entry in entries for closing in self._retire(key, entry)]
+        self._close_all(to_close)
+
+    def open_paths(self):
+        with self._lock:
+            return list(self._handles)
+
+    def _evict_over_capacity(self):
+        # Least recently used first, skipping handles in use; the pool may run over while all are leased
+        to_close = []
+        for key in list(self._handles):
+            if len(self._handles) <= self.max_size:
+                break
+            entry = self._handles[key]
+            if entry.leases == 0 and entry.ready.is_set():
+                del self._handles[key]
+                to_close.extend(self._retire(key, entry))
+        return to_close
+
+    def _evict_idle(self):
+        if self.idle_seconds <= 0:
+            return []
+        cutoff = time.monotonic() - self.idle_seconds
+        to_close = []
+        for key in [k for k, entry in self._handles.items() if entry.leases == 0 and entry.last_used < cutoff]:
+            to_close.extend(self._retire(key, self._handles.pop(key)))
+        return to_close
+
+
+def _close_handle(path, handle):
+    """Stop the client's system so its sqlite connections and segment files are released."""
+    try:
+        client = getattr(handle, "_client", None)
+        system = getattr(client, "_system", None)
+        if system is not None:
+            system.stop()
+        # chromadb keeps one shared system per persist directory
+        from chromadb.api.client import SharedSystemClient
+        identifier = getattr(handle, "_persist_directory", None) or path
+        getattr(SharedSystemClient, "_identifer_to_system", {}).pop(identifier, None)
+        logger.info(f"Closed Chroma handle for {path}")
+    except Exception as e:
+        logger.warning(f"Error closing Chroma handle for {path}: {str(e)}")
+
+
+handle_pool = ChromaHandlePool()
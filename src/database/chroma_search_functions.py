@@ -4,120 +4,368 @@
 # from FlagEmbedding.flag_models import FlagModel
 # from FlagEmbedding.flag_reranker import FlagReranker\
 from src.data_processing.cache_functions import get_cached_query_result, retrieve_or_initialize_cache, store_in_cache
-from src.data_processing.get_embeddings import get_embeddings
-from langchain_community.vectorstores import Chroma
-from src.models.models import cohere_reranker
-import sqlite3
+from src.data_processing.get_embeddings import get_embeddings, embed_query, embed_queries
+from src.database.chroma_handles import handle_pool
+from src.database.retrieval_types import RetrievedChunk
+from src.database.lexical_index import get_lexical_index, is_keyword_query, reciprocal_rank_fusion
+from src.prompts.context_packer import estimate_tokens
+from src.models.rerankers import get_reranker, CachedReranker
+from dataclasses import replace
+from functools import partial
+import asyncio
 import os
 
+# "hybrid" fuses BM25 and dense results, "dense" is Chroma search alone
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Answer short keyword queries from the BM25 index without embedding the query
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "1") == "1"
+# Collections at or under both limits are sent whole, skipping embedding, search and rerank
+WHOLE_DOCUMENT_MAX_CHUNKS = int(os.getenv("WHOLE_DOCUMENT_MAX_CHUNKS", "8"))
+WHOLE_DOCUMENT_MAX_TOKENS = int(os.getenv("WHOLE_DOCUMENT_MAX_TOKENS", "3000"))
+
 # Get ChromaDB path from environment variable or use default
 def get_chroma_path():
     return os.environ.get('CHROMA_PATH', "data/processed/chroma")
 
-# load the data
-def get_chroma_db(get_embeddings=get_embeddings):
-    chroma_path = get_chroma_path()
-    print(f"Using Chroma DB at: {chroma_path}")
-    return Chroma(persist_directory=chroma_path, embedding_function=get_embeddings())
+# load the data, leasing the pooled handle for this path: `with get_chroma_db(path) as chroma_db:`
+def get_chroma_db(chroma_path=None, get_embeddings=get_embeddings):
+    return handle_pool.lease(chroma_path or get_chroma_path(), get_embeddings())
 
 
-def retrieve_documents(query, top_k=8):
-    chroma_db = get_chroma_db()
-    print("#"*100 + "\n\n")
+def retrieve_documents(query, top_k=8, query_embedding=None, chroma_path=None, section=None):
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+    return retrieve_documents_batch([query], top_k, [query_embedding], chroma_path, section)[0]
 
-    print("Retrieving documents...")
-    results = chroma_db.similarity_search_with_score(query, top_k)
-    context_text= "\n\n---\n\n".join([doc.page_content for doc, _score in results])
 
-    print("Documents before reranking: ", context_text)
+def retrieve_documents_batch(queries, top_k=8, query_embeddings=None, chroma_path=None, section=None):
+    """Dense candidates for each of `queries`, searched in one Chroma query."""
+    print("#"*100 + "\n\n")
 
-    return context_text
+    print("Retrieving documents...")
+    if query_embeddings is None:
+        query_embeddings = embed_queries(queries)
+    with get_chroma_db(chroma_path) as chroma_db:
+        # Query the collection directly so chunk IDs and metadata come back with the text
+        results = chroma_db._collection.query(
+            query_embeddings=[query_embedding.tolist() for query_embedding in query_embeddings],
+            n_results=top_k,
+            # Restrict the search to one resume section ("skills", "education", ...)
+            where={"section": section} if section else None,
+            include=["documents", "metadatas", "distances"],
+        )
+        relevance = chroma_db._select_relevance_score_fn()
+    batch = []
+    for ids, documents, metadatas, distances in zip(
+        results["ids"], results["documents"], results["metadatas"], results["distances"]
+    ):
+        chunks = [
+            RetrievedChunk(
+                chunk_id=chunk_id,
+                text=text.strip(),
+                vector_score=relevance(distance),
+                metadata=metadata or {},
+            )
+            for chunk_id, text, metadata, distance in zip(ids, documents, metadatas, distances)
+            if text and text.strip()
+        ]
+        print("Documents before reranking: ", format_context(chunks))
+        batch.append(chunks)
+
+    return batch
+
+
+def retrieve_lexical(query, top_k=8, chroma_path=None, section=None):
+    index = get_lexical_index(chroma_path or get_chroma_path())
+    return index.search(query, top_k, section) if index is not None else []
+
+
+def retrieve_hybrid(query, top_k=8, query_embedding=None, chroma_path=None, section=None):
+    """Dense and BM25 candidates merged with reciprocal rank fusion."""
+    dense = retrieve_documents(query, top_k, query_embedding, chroma_path, section)
+    if RETRIEVAL_MODE == "dense":
+        return dense
+    return reciprocal_rank_fusion([dense, retrieve_lexical(query, top_k, chroma_path, section)], top_k)
+
+
+def retrieve_hybrid_batch(queries, top_k=8, query_embeddings=None, chroma_path=None, section=None):
+    dense = retrieve_documents_batch(queries, top_k, query_embeddings, chroma_path, section)
+    if RETRIEVAL_MODE == "dense":
+        return dense
+    return [
+        reciprocal_rank_fusion([chunks, retrieve_lexical(query, top_k, chroma_path, section)], top_k)
+        for query, chunks in zip(queries, dense)
+    ]
+
+
+def whole_document_chunks(chroma_path, section=None):
+    """Every chunk (of `section`, if given) in page order when small enough to send whole, else None."""
+    if WHOLE_DOCUMENT_MAX_CHUNKS <= 0:
+        return None
+    # The keyword index already holds the collection's chunks in memory
+    index = get_lexical_index(chroma_path)
+    # Check the size before building anything; large collections take the normal path
+    if index is None or not 0 < index.count(section) <= WHOLE_DOCUMENT_MAX_CHUNKS:
+        return None
+    chunks = [
+        RetrievedChunk(chunk_id=chunk_id, text=document.strip(), metadata=metadata)
+        for chunk_id, document, metadata in zip(index.ids, index.documents, index.metadatas)
+        if document and document.strip() and (section is None or metadata.get("section") == section)
+    ]
+    if not chunks:
+        return None
+    if sum(estimate_tokens(chunk.text) for chunk in chunks) > WHOLE_DOCUMENT_MAX_TOKENS:
+        return None
+
+    print(f"small collection ({len(chunks)} chunks), using the whole document as context.")
+    return sorted(chunks, key=lambda chunk: (chunk.source or "", chunk.page or 0))
+
+
+def usable_section(chroma_path, section):
+    """`section` if the collection has chunks tagged with it; collections chunked before
+    sections were detected (or resumes without that heading) are searched in full."""
+    if not section:
+        return None
+    index = get_lexical_index(chroma_path)
+    if index is None or not index.count(section):
+        print(f"no '{section}' section in this collection, searching all of it.")
+        return None
+    return section
+
+
+def lexical_fast_path(query, chroma_path, section=None):
+    """Lexical candidates for keyword queries the BM25 index fully covers, else None."""
+    if not LEXICAL_FAST_PATH or RETRIEVAL_MODE == "dense":
+        return None
+    index = get_lexical_index(chroma_path)
+    if not is_keyword_query(query, index):
+        return None
+    print("keyword query, retrieving from the lexical index only.")
+    return index.search(query, section=section)
 
 
 """
-If you want to use the FlagReranker to rerank the retrieved documents, you can use the following code snippet:
-
-    reranker = FlagModel("BAAI/bge-reranker-v2-m3", use_fp16=True)
-
-    def reranked_documents(query, retrieved_chunks, top_k=3):
-        reranked_chunks = reranker.predict(query, retrieved_chunks)
-        return [chunk for chunk, _ in reranked_chunks[:top_k]]
-    
-    Initialize the FlagReranker
-    reranker = FlagReranker('BAAI/bge-reranker-v2-m3', use_fp16=True)
-    
-    
-I'll personally use the cohere API to rerank the documents.
+Reranking goes through a pluggable backend (see src/models/rerankers.py):
+RERANKER_BACKEND=cohere calls the Cohere API, RERANKER_BACKEND=cross-encoder
+scores locally on CPU with a cross-encoder such as BAAI/bge-reranker-base,
+optionally on ONNX Runtime.
 """
 
 
 def format_context(context):
-    return "\n\n".join([f"Chunk {i+1}: {chunk}" for i, chunk in enumerate(context)])
+    # Entries cached before chunks were structured are plain strings
+    return "\n\n".join([f"Chunk {i+1}: {getattr(chunk, 'text', chunk)}" for i, chunk in enumerate(context)])
 
 
 
-def add_to_chroma_db(reranked_chunks):
-    chroma_db = get_chroma_db()
-    chroma_db.add_documents(reranked_chunks)
-    chroma_db.persist()
+def add_to_chroma_db(reranked_chunks, chroma_path=None):
+    with get_chroma_db(chroma_path) as chroma_db:
+        chroma_db.add_documents(reranked_chunks)
+        chroma_db.persist()
 
 
-def reranked_documents(query, long_string, top_k=5):
-    # Split the long string into individual chunks using '\n\n---\n\n' as the separator
-    chunks = long_string.split("\n\n---\n\n")
+def _rerank_kwargs(reranker, chunks):
+    # The score cache keys on chunk IDs; plain backends only take the texts
+    return {"doc_ids": [chunk.chunk_id for chunk in chunks]} if isinstance(reranker, CachedReranker) else {}
 
-    # Ensure all chunks are valid (non-empty) and strip leading/trailing whitespace
-    valid_chunks = [chunk.strip() for chunk in chunks if chunk.strip()]
 
-    if not valid_chunks:
+def reranked_documents(query, chunks, top_k=5):
+    if not chunks:
         print("No valid chunks to rerank.")
         return []
     
-    # cohere reranker
-    rerank_docs = cohere_reranker(query, valid_chunks, top_k)
+    reranker = get_reranker()
+    ranking = reranker.rerank(query, [chunk.text for chunk in chunks], top_k, **_rerank_kwargs(reranker, chunks))
+    return apply_rerank(chunks, ranking)
+
+
+async def reranked_documents_async(query, chunks, top_k=5):
+    if not chunks:
+        print("No valid chunks to rerank.")
+        return []
 
+    reranker = get_reranker()
+    ranking = await reranker.rerank_async(
+        query, [chunk.text for chunk in chunks], top_k, **_rerank_kwargs(reranker, chunks)
+    )
+    return apply_rerank(chunks, ranking)
+
+
+def reranked_documents_batch(queries, chunk_lists, top_k=5):
+    """reranked_documents() for several queries, scored in one reranker call."""
+    todo = [i for i, chunks in enumerate(chunk_lists) if chunks]
+    results = [[] for _ in chunk_lists]
+    if not todo:
+        return results
+
+    reranker = get_reranker()
+    kwargs = {}
+    if isinstance(reranker, CachedReranker):
+        kwargs["doc_ids_lists"] = [[chunk.chunk_id for chunk in chunk_lists[i]] for i in todo]
+    rankings = reranker.rerank_many(
+        [queries[i] for i in todo], [[chunk.text for chunk in chunk_lists[i]] for i in todo], top_k, **kwargs
+    )
+    for i, ranking in zip(todo, rankings):
+        results[i] = apply_rerank(chunk_lists[i], ranking)
+    return results
+
+
+def apply_rerank(chunks, ranking):
     print("#"*100 + "\n\n")
 
-    # Extract and print reranked chunks using the indices from the rerank response
-    reranked_chunks = [valid_chunks[result.index] for result in rerank_docs.results]
+    # Keep the reranker's order and record its score on each chunk
+    reranked_chunks = [replace(chunks[index], rerank_score=float(score)) for index, score in ranking]
     print("Reranked Chunks:\n\n", format_context(reranked_chunks))
 
     return reranked_chunks
     
 
 
-def get_relevant_data(query):
-    cache = retrieve_or_initialize_cache()
-    
-    cached_result = get_cached_query_result(cache, query)
+def lookup_cached_data(query, chroma_path, query_embedding=None):
+    """Embed the query and check the collection's cache; returns (cache, embedding, cached result)."""
+    # Embed once; the same vector drives the cache lookup and the Chroma search
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+    cache = retrieve_or_initialize_cache(chroma_path, len(query_embedding))
+    return cache, query_embedding, get_cached_query_result(cache, query, query_embedding)
+
+
+def get_relevant_data(query, chroma_path=None, query_embedding=None, section=None):
+    """Context chunks for `query`: the whole document for small collections, BM25 alone for
+    keyword queries, otherwise cached or freshly retrieved and reranked hybrid results.
+    With `section` only chunks from that resume section are considered."""
+    chroma_path = chroma_path or get_chroma_path()
+    section = usable_section(chroma_path, section)
+
+    whole_document = whole_document_chunks(chroma_path, section)
+    if whole_document:
+        return whole_document
+
+    lexical_chunks = lexical_fast_path(query, chroma_path, section)
+    if lexical_chunks:
+        return reranked_documents(query, lexical_chunks)
+
+    if section:
+        # The query cache holds whole-collection results
+        cache, cached_result = None, None
+    else:
+        cache, query_embedding, cached_result = lookup_cached_data(query, chroma_path, query_embedding)
     if cached_result:
         print("retrieve results from cache.")
         return cached_result
 
-    retrieved_chunks = retrieve_documents(query)
+    retrieved_chunks = retrieve_hybrid(query, query_embedding=query_embedding, chroma_path=chroma_path, section=section)
     reranked_chunks = reranked_documents(query, retrieved_chunks)
-    store_in_cache(cache, query, reranked_chunks)
+    if cache is not None:
+        store_in_cache(cache, query, reranked_chunks, query_embedding)
+    return reranked_chunks
+
+
+def get_relevant_data_batch(queries, chroma_path=None, query_embeddings=None, section=None):
+    """get_relevant_data() for a list of queries against one collection.
+
+    Queries that need a vector are embedded in one forward pass, the ones the
+    query cache can't answer are searched together, and every candidate list is
+    reranked in a single call. Returns one list of chunks per query, in order.
+    """
+    chroma_path = chroma_path or get_chroma_path()
+    section = usable_section(chroma_path, section)
+
+    whole_document = whole_document_chunks(chroma_path, section)
+    if whole_document:
+        return [whole_document for _ in queries]
+
+    query_embeddings = list(query_embeddings or [None] * len(queries))
+    results = [None] * len(queries)
+    candidates = {}  # query index -> chunks to rerank
+    dense = []
+    for i, query in enumerate(queries):
+        lexical_chunks = lexical_fast_path(query, chroma_path, section)
+        if lexical_chunks:
+            candidates[i] = lexical_chunks
+        else:
+            dense.append(i)
+
+    missing = [i for i in dense if query_embeddings[i] is None]
+    for i, query_embedding in zip(missing, embed_queries([queries[i] for i in missing])):
+        query_embeddings[i] = query_embedding
+
+    caches = {}
+    to_search = []
+    for i in dense:
+        if section:
+            # The query cache holds whole-collection results
+            to_search.append(i)
+            continue
+        cache, _, cached_result = lookup_cached_data(queries[i], chroma_path, query_embeddings[i])
+        if cached_result:
+            print("retrieve results from cache.")
+            results[i] = cached_result
+        else:
+            caches[i] = cache
+            to_search.append(i)
+
+    if to_search:
+        retrieved = retrieve_hybrid_batch(
+            [queries[i] for i in to_search], query_embeddings=[query_embeddings[i] for i in to_search],
+            chroma_path=chroma_path, section=section
+        )
+        candidates.update(zip(to_search, retrieved))
+
+    order = list(candidates)
+    reranked = reranked_documents_batch([queries[i] for i in order], [candidates[i] for i in order])
+    for i, reranked_chunks in zip(order, reranked):
+        results[i] = reranked_chunks
+        if i in caches:
+            store_in_cache(caches[i], queries[i], reranked_chunks, query_embeddings[i])
+    return results
+
+
+async def get_relevant_data_async(query, chroma_path=None, executor=None, query_embedding=None, section=None):
+    """get_relevant_data() for event loops: CPU-bound steps run on `executor`, rerank is awaited."""
+    chroma_path = chroma_path or get_chroma_path()
+    loop = asyncio.get_running_loop()
+    section = await loop.run_in_executor(executor, usable_section, chroma_path, section)
+
+    whole_document = await loop.run_in_executor(executor, whole_document_chunks, chroma_path, section)
+    if whole_document:
+        return whole_document
+
+    lexical_chunks = await loop.run_in_executor(executor, lexical_fast_path, query, chroma_path, section)
+    if lexical_chunks:
+        return await reranked_documents_async(query, lexical_chunks)
+
+    if section:
+        cache, cached_result = None, None
+    else:
+        cache, query_embedding, cached_result = await loop.run_in_executor(
+            executor, lookup_cached_data, query, chroma_path, query_embedding
+        )
+    if cached_result:
+        print("retrieve results from cache.")
+        return cached_result
+
+    retrieved_chunks = await loop.run_in_executor(
+        executor, partial(retrieve_hybrid, query, query_embedding=query_embedding, chroma_path=chroma_path, section=section)
+    )
+    reranked_chunks = await reranked_documents_async(query, retrieved_chunks)
+    if cache is not None:
+        await loop.run_in_executor(executor, store_in_cache, cache, query, reranked_chunks, query_embedding)
     return reranked_chunks
 
 
 
-def close_chroma_db_connection():
+def close_chroma_db_connection(chroma_path=None):
+    """Delete the collection at `chroma_path` and release its pooled handle."""
+    chroma_path = chroma_path or get_chroma_path()
     try:
-        chroma_db_connection = get_chroma_db()
-        if chroma_db_connection is not None:
+        with handle_pool.lease(chroma_path, get_embeddings()) as chroma_db_connection:
             chroma_db_connection.delete_collection()
-            chroma_db_connection.persist()
-            chroma_db_connection = None
-
-        # Forcefully close SQLite connection
-        chroma_path = get_chroma_path()
-        sqlite_path = os.path.join(chroma_path, 'chroma.sqlite3')
-        if os.path.exists(sqlite_path):
-            conn = sqlite3.connect(sqlite_path)
-            conn.close()
-            print(f"ChromaDB connection closed successfully for {sqlite_path}.")
     except Exception as e:
-        print(f"Error closing ChromaDB connection: {e}")
+        print(f"Error deleting ChromaDB collection: {e}")
+    finally:
+        if handle_pool.close(chroma_path):
+            print(f"ChromaDB connection closed successfully for {chroma_path}.")
 
 
 
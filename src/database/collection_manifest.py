@@ -0,0 +1,91 @@
+import threading
+import hashlib
+import logging
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+
+
+def file_fingerprint(file_path: str) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CollectionManifest:
+    """Persistent map from uploaded file content hash to the collection built from it."""
+
+    def __init__(self, base_path: str):
+        self.path = os.path.join(base_path, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable collection manifest {self.path}: {str(e)}")
+            return {}
+
+    def _save(self):
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(self.path + ".tmp", self.path)
+
+    def lookup(self, fingerprint: str, embedding_model: str):
+        """The entry for this content, if it was embedded with the same model."""
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+        if entry is None or entry.get("embedding_model") != embedding_model:
+            return None
+        return entry
+
+    def record(self, fingerprint: str, collection_id: str, filename: str, embedding_model: str,
+               references: int = 1):
+        """Map content to its new collection; `references` counts the uploads handed that collection."""
+        with self._lock:
+            self._entries[fingerprint] = {
+                "collection_id": collection_id,
+                "filename": filename,
+                "embedding_model": embedding_model,
+                "created_at": time.time(),
+                "references": references,
+            }
+            self._save()
+
+    def retain(self, fingerprint: str):
+        """Count one more upload deduplicated onto this content's collection."""
+        with self._lock:
+            entry = self._entries[fingerprint]
+            entry["references"] = entry.get("references", 1) + 1
+            self._save()
+
+    def release(self, collection_id: str) -> int:
+        """Drop one upload's reference to a collection and return how many remain.
+
+        Once none remain the collection's fingerprints are forgotten and its data
+        may be deleted; collections the manifest doesn't know report 0.
+        """
+        with self._lock:
+            entries = [(fp, entry) for fp, entry in self._entries.items() if entry["collection_id"] == collection_id]
+            remaining = sum(entry.get("references", 1) for _, entry in entries) - 1
+            if remaining > 0:
+                entry = next(entry for _, entry in entries if entry.get("references", 1) > 0)
+                entry["references"] = entry.get("references", 1) - 1
+            else:
+                remaining = 0
+                for fingerprint, _ in entries:
+                    del self._entries[fingerprint]
+            if entries:
+                self._save()
+            return remaining
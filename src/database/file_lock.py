@@ -0,0 +1,19 @@
+from contextlib import contextmanager
+import fcntl
+import os
+
+LOCK_FILE = "lock"
+
+
+@contextmanager
+def directory_lock(directory: str):
+    """Exclusive flock on `directory`/lock, serializing writers across processes.
+
+    The server and bulk_ingest.py write to the same on-disk stores.
+    """
+    with open(os.path.join(directory, LOCK_FILE), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,175 @@
+from src.data_processing.get_embeddings import get_embeddings
+from src.database.chroma_handles import handle_pool
+from src.database.retrieval_types import RetrievedChunk
+from collections import Counter, defaultdict
+from dataclasses import replace
+from typing import List
+import threading
+import logging
+import math
+import json
+import re
+import os
+
+logger = logging.getLogger(__name__)
+
+# Stored next to the collection, like the query cache and insights files
+LEXICAL_INDEX_FILE = "lexical_index.json"
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Keyword queries of at most this many terms skip embedding entirely
+LEXICAL_FAST_PATH_MAX_TERMS = int(os.getenv("LEXICAL_FAST_PATH_MAX_TERMS", "3"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from", "has", "have",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "the", "to", "was", "with", "you", "your",
+}
+# A query opening like a question wants the dense retriever's semantic matching
+QUESTION_WORDS = {
+    "what", "which", "who", "when", "where", "why", "how", "describe", "explain", "tell",
+    "summarize", "list", "give", "generate", "can", "could", "should", "would", "is", "are", "does", "do",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms that keep skill names like c++, c#, node.js and ci/cd intact."""
+    text = re.sub(r"['’]s\b", "", text.lower())
+    tokens = (token.rstrip(".") for token in re.findall(r"[a-z0-9][a-z0-9+#./-]*", text))
+    return [token for token in tokens if token and token not in STOPWORDS]
+
+
+class LexicalIndex:
+    """BM25 over one collection's chunks, using the same chunk IDs as Chroma."""
+
+    def __init__(self, ids, documents, metadatas, k1: float = BM25_K1, b: float = BM25_B):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = [metadata or {} for metadata in metadatas]
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # term -> [(doc index, term frequency)]
+        self.doc_lengths = []
+        for index, document in enumerate(self.documents):
+            terms = tokenize(document or "")
+            self.doc_lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self.postings[term].append((index, frequency))
+        self.avg_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+        # Chunks per resume section, so section lookups don't scan the metadata per query
+        self.section_counts = Counter(metadata.get("section") for metadata in self.metadatas)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def count(self, section: str = None) -> int:
+        """Chunks in the collection, or in one section of it."""
+        return len(self) if section is None else self.section_counts.get(section, 0)
+
+    def covers(self, terms) -> bool:
+        return bool(terms) and all(term in self.postings for term in terms)
+
+    def search(self, query: str, top_k: int = 8, section: str = None) -> List[RetrievedChunk]:
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self.ids) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, frequency in postings:
+                if section and self.metadatas[index].get("section") != section:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[index] / (self.avg_length or 1))
+                scores[index] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [
+            RetrievedChunk(
+                chunk_id=self.ids[index],
+                text=self.documents[index].strip(),
+                lexical_score=score,
+                metadata=self.metadatas[index],
+            )
+            for index, score in ranked
+            if self.documents[index] and self.documents[index].strip()
+        ]
+
+    def save(self, path):
+        with open(path + ".tmp", "w") as f:
+            json.dump({"ids": self.ids, "documents": self.documents, "metadatas": self.metadatas}, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            stored = json.load(f)
+        return cls(stored["ids"], stored["documents"], stored["metadatas"])
+
+
+_indexes = {}  # abspath -> (index file mtime, LexicalIndex)
+_indexes_lock = threading.Lock()
+
+
+def build_lexical_index(chroma_path):
+    """(Re)build the collection's index from what is stored in Chroma and persist it."""
+    with handle_pool.lease(chroma_path, get_embeddings()) as chroma_db:
+        stored = chroma_db._collection.get(include=["documents", "metadatas"])
+    index = LexicalIndex(stored["ids"], stored["documents"], stored["metadatas"])
+    path = os.path.join(chroma_path, LEXICAL_INDEX_FILE)
+    index.save(path)
+    with _indexes_lock:
+        _indexes[os.path.abspath(chroma_path)] = (os.stat(path).st_mtime_ns, index)
+    logger.info(f"Built lexical index over {len(index)} chunks in {chroma_path}")
+    return index
+
+
+def get_lexical_index(chroma_path):
+    """The collection's index, reloaded when its file changes and built for collections ingested without one."""
+    path = os.path.join(chroma_path, LEXICAL_INDEX_FILE)
+    if not os.path.exists(path):
+        if not os.path.isdir(chroma_path):
+            return None
+        return build_lexical_index(chroma_path)
+
+    mtime = os.stat(path).st_mtime_ns
+    key = os.path.abspath(chroma_path)
+    with _indexes_lock:
+        loaded = _indexes.get(key)
+    if loaded and loaded[0] == mtime:
+        return loaded[1]
+    try:
+        index = LexicalIndex.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Rebuilding unreadable lexical index {path}: {str(e)}")
+        return build_lexical_index(chroma_path)
+    with _indexes_lock:
+        _indexes[key] = (mtime, index)
+    return index
+
+
+def is_keyword_query(query: str, index: LexicalIndex) -> bool:
+    """Short keyword lookups ("Python", "AWS", "Master's") whose terms all occur in the collection."""
+    words = query.lower().split()
+    if not words or len(words) > LEXICAL_FAST_PATH_MAX_TERMS or words[0] in QUESTION_WORDS or query.strip().endswith("?"):
+        return False
+    return index is not None and index.covers(tokenize(query))
+
+
+def reciprocal_rank_fusion(rankings: List[List[RetrievedChunk]], top_k: int = 8, k: int = RRF_K) -> List[RetrievedChunk]:
+    """Merge ranked lists by summing 1 / (k + rank), keeping each retriever's score on the chunk."""
+    fused = {}
+    chunks = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            fused[chunk.chunk_id] = fused.get(chunk.chunk_id, 0.0) + 1.0 / (k + rank)
+            seen = chunks.get(chunk.chunk_id)
+            if seen is None:
+                chunks[chunk.chunk_id] = chunk
+            else:
+                chunks[chunk.chunk_id] = replace(
+                    seen,
+                    vector_score=seen.vector_score if seen.vector_score is not None else chunk.vector_score,
+                    lexical_score=seen.lexical_score if seen.lexical_score is not None else chunk.lexical_score,
+                )
+    order = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return [chunks[chunk_id] for chunk_id in order]
@@ -0,0 +1,21 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class RetrievedChunk:
+    """One chunk as it moves through retrieval -> rerank -> prompt."""
+    chunk_id: str
+    text: str
+    vector_score: Optional[float] = None
+    lexical_score: Optional[float] = None
+    rerank_score: Optional[float] = None
+    metadata: dict = field(default_factory=dict)
+
+    @property
+    def page(self):
+        return self.metadata.get("page")
+
+    @property
+    def source(self):
+        return self.metadata.get("source")
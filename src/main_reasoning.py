@@ -1,13 +1,24 @@
-from data.process_data import load_documents, embed_and_store_documents, split_documents
-from src.database.chroma_search_functions import get_relevant_data
+from data.process_data import ingest_directory, DATA_PATH
+from src.database.chroma_search_functions import (
+    get_relevant_data, get_relevant_data_async, get_relevant_data_batch, format_context, get_chroma_path
+)
+from src.data_processing.answer_cache import answer_cache, answer_variant, ANSWER_CACHE_SEMANTIC
+from src.data_processing.get_embeddings import embed_query, embed_queries
 from langchain.prompts import ChatPromptTemplate
-from src.models.models import llama_groq
+from src.models.models import llama_groq, llama_groq_async, LLM_PARAMS
+from src.prompts.context_packer import pack_context, context_budget
+from src.models.rerankers import normalize_query
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
 
+# Groq completions in flight at once for one batch of queries
+QUERY_BATCH_CONCURRENCY = int(os.getenv("QUERY_BATCH_CONCURRENCY", "4"))
 
-def check_and_process_documents():
-    # Get ChromaDB path from environment or default
-    chroma_path = os.environ.get('CHROMA_PATH', "data/processed/chroma")
+
+def check_and_process_documents(chroma_path=None):
+    # Use the given ChromaDB path, or the one from the environment or default
+    chroma_path = chroma_path or os.environ.get('CHROMA_PATH', "data/processed/chroma")
     print(f"Using ChromaDB path: {chroma_path}")
     
     excluded_file = "chroma.sqlite3"  # Specify the file to exclude
@@ -23,13 +34,8 @@ def check_and_process_documents():
     if not os.path.exists(chroma_path) or is_only_excluded_file_present():
         print(f"Path does not exist or only {excluded_file} is present.")
         
-        documents = load_documents()
-        print("Documents loaded")
-        
-        chunks = split_documents(documents)
-        print("Documents split into chunks")
-        
-        embed_and_store_documents(chunks)
+        # Pages are split and embedded while the rest are still being extracted
+        ingest_directory(DATA_PATH, chroma_path)
         print("Documents embedded and stored")
     else:
         print(f"Path already exists and contains files other than {excluded_file}")
@@ -38,15 +44,168 @@ def check_and_process_documents():
 
 
 
-def reasoning(query, prompt):
+def _cached_answer(query, prompt, chroma_path, section=None):
+    """Look the answer up before any retrieval work; returns (variant, query embedding, answer)."""
+    if answer_cache is None:
+        return None, None, None
+    variant = answer_variant(prompt, {**LLM_PARAMS, "section": section})
+    # The semantic tier needs the query vector; retrieval reuses it on a miss
+    query_embedding = embed_query(query) if ANSWER_CACHE_SEMANTIC else None
+    return variant, query_embedding, answer_cache.get(chroma_path, variant, query, query_embedding)
+
+
+def _store_answer(chroma_path, variant, query, answer, query_embedding):
+    if answer_cache is not None and answer:
+        answer_cache.put(chroma_path, variant, query, answer, query_embedding)
+
+
+def _record_stream(deltas, store):
+    """Pass deltas through and cache the full answer once the stream completes."""
+    parts = []
+    for delta in deltas:
+        parts.append(delta)
+        yield delta
+    store("".join(parts))
+
+
+async def _record_stream_async(deltas, store):
+    parts = []
+    async for delta in deltas:
+        parts.append(delta)
+        yield delta
+    store("".join(parts))
+
+
+async def _single_delta_async(text):
+    yield text
+
+
+def _answer(query, prompt, results, stream=False):
+    # Merge overlapping chunks and keep the best ones within the model's window
+    context = pack_context(results, context_budget(prompt, query))
+    prompt_template = ChatPromptTemplate.from_template(prompt)
+    formatted_prompt = prompt_template.format(context=format_context(context), question=query)
+    return llama_groq(query, formatted_prompt, stream=stream)
+
+
+def reasoning(query, prompt, chroma_path=None, stream=False, section=None):
+    """Answer `query` against the collection at `chroma_path`.
+
+    Callers serving a specific resume pass its collection path explicitly; only
+    the path-less default bootstraps itself from the documents in data/test.
+    With stream=True the answer is returned as a generator of text deltas, and
+    `section` limits retrieval to one resume section such as "skills".
+    Repeated questions are answered from the answer cache without retrieval.
+    """
+    if chroma_path is None:
+        check_and_process_documents()
+    cache_path = chroma_path or get_chroma_path()
 
-    check_and_process_documents()
+    variant, query_embedding, answer = _cached_answer(query, prompt, cache_path, section)
+    if answer is not None:
+        print("retrieve answer from cache.")
+        return iter([answer]) if stream else answer
 
     print("#"*100 + "\n\n")
     
-    results = get_relevant_data(query)
+    results = get_relevant_data(query, chroma_path, query_embedding, section)
+    response = _answer(query, prompt, results, stream=stream)
 
+    def store(answer):
+        _store_answer(cache_path, variant, query, answer, query_embedding)
+
+    if stream:
+        return _record_stream(response, store)
+    store(response)
+    return response
+
+
+async def reasoning_async(query, prompt, chroma_path, stream=False, executor=None, section=None):
+    """reasoning() for the async server: embedding and Chroma run on `executor`,
+    Cohere and Groq calls are awaited without holding a thread."""
+    loop = asyncio.get_running_loop()
+    variant, query_embedding, answer = await loop.run_in_executor(
+        executor, _cached_answer, query, prompt, chroma_path, section
+    )
+    if answer is not None:
+        return _single_delta_async(answer) if stream else answer
+
+    results = await get_relevant_data_async(query, chroma_path, executor, query_embedding, section)
+
+    # Merge overlapping chunks and keep the best ones within the model's window
+    context = pack_context(results, context_budget(prompt, query))
     prompt_template = ChatPromptTemplate.from_template(prompt)
-    prompt = prompt_template.format(context=results, question=query)
-    response = llama_groq(query, prompt)
-    return response
\ No newline at end of file
+    formatted_prompt = prompt_template.format(context=format_context(context), question=query)
+    response = await llama_groq_async(query, formatted_prompt, stream=stream)
+
+    def store(answer):
+        _store_answer(chroma_path, variant, query, answer, query_embedding)
+
+    if stream:
+        return _record_stream_async(response, store)
+    await loop.run_in_executor(executor, store, response)
+    return response
+
+
+def reasoning_batch(queries, prompts, chroma_path, section=None, max_concurrency=QUERY_BATCH_CONCURRENCY):
+    """Answer several queries against one collection; `prompts[i]` is the template for `queries[i]`.
+
+    Repeats (after normalizing case, spacing and trailing punctuation) are
+    answered once. Cache misses are embedded, retrieved and reranked as one
+    batch, then up to `max_concurrency` Groq completions run at a time.
+    Returns one {"query", "response"} or {"query", "error"} dict per query, in order.
+    """
+    unique = {}  # (normalized query, prompt) -> first spelling of the query
+    for query, prompt in zip(queries, prompts):
+        unique.setdefault((normalize_query(query), prompt), query)
+    keys = list(unique)
+
+    embeddings = [None] * len(keys)
+    if answer_cache is not None and ANSWER_CACHE_SEMANTIC:
+        # The semantic tier needs every vector up front; retrieval reuses them
+        embeddings = embed_queries([unique[key] for key in keys])
+
+    outcomes, variants, pending = {}, {}, []
+    for key, query_embedding in zip(keys, embeddings):
+        query, prompt = unique[key], key[1]
+        if answer_cache is None:
+            pending.append((key, query_embedding))
+            continue
+        variants[key] = answer_variant(prompt, {**LLM_PARAMS, "section": section})
+        answer = answer_cache.get(chroma_path, variants[key], query, query_embedding)
+        if answer is not None:
+            outcomes[key] = {"response": answer}
+        else:
+            pending.append((key, query_embedding))
+    print(f"{len(queries)} queries, {len(keys)} unique, {len(keys) - len(pending)} answered from cache.")
+
+    if pending:
+        try:
+            results = get_relevant_data_batch(
+                [unique[key] for key, _ in pending], chroma_path, [query_embedding for _, query_embedding in pending],
+                section
+            )
+        except Exception as e:
+            results = [e] * len(pending)
+
+        def complete(item):
+            (key, query_embedding), result = item
+            query, prompt = unique[key], key[1]
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                response = _answer(query, prompt, result)
+            except Exception as e:
+                print(f"Error answering '{query}': {e}")
+                return key, {"error": str(e)}
+            if key in variants:
+                _store_answer(chroma_path, variants[key], query, response, query_embedding)
+            return key, {"response": response}
+
+        with ThreadPoolExecutor(max(1, min(max_concurrency, len(pending)))) as pool:
+            outcomes.update(pool.map(complete, zip(pending, results)))
+
+    return [
+        {"query": query, **outcomes[(normalize_query(query), prompt)]}
+        for query, prompt in zip(queries, prompts)
+    ]
@@ -0,0 +1,148 @@
+import threading
+import logging
+import time
+import gc
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Process-wide registry that loads each model once and shares it across requests."""
+
+    def __init__(self):
+        self._models = {}
+        self._loaders = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._unload_hooks = {}  # name -> callbacks that drop other references to the model
+
+    def register(self, name: str, loader):
+        """Register a zero-argument loader for a model without loading it."""
+        with self._lock:
+            self._loaders[name] = loader
+            self._load_locks.setdefault(name, threading.Lock())
+
+    def proxy(self, name: str):
+        """A stand-in for `name` that resolves through the registry on every use.
+
+        Hand this to anything that keeps the model (Chroma handles, query caches),
+        so unload() actually releases it and the next call loads it again.
+        """
+        return ModelProxy(self, name)
+
+    def on_unload(self, name: str, callback):
+        """Call `callback()` when `name` is unloaded, e.g. to stop worker pools holding it."""
+        with self._lock:
+            self._unload_hooks.setdefault(name, []).append(callback)
+
+    def get(self, name: str, loader=None):
+        """Return the shared instance for `name`, loading it on first use."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            if loader is not None:
+                self._loaders.setdefault(name, loader)
+            if name not in self._loaders:
+                raise KeyError(f"No loader registered for model '{name}'")
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Only one thread loads a given model; the others wait and reuse it
+        with load_lock:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            rss_before = _process_rss()
+            start = time.perf_counter()
+            model = self._loaders[name]()
+            load_seconds = time.perf_counter() - start
+
+            memory_bytes = _parameter_bytes(model)
+            if memory_bytes is None and rss_before is not None:
+                memory_bytes = max((_process_rss() or rss_before) - rss_before, 0)
+
+            with self._lock:
+                self._models[name] = model
+                self._stats[name] = {
+                    "load_seconds": round(load_seconds, 3),
+                    "memory_bytes": memory_bytes,
+                    "loaded_at": time.time(),
+                }
+            logger.info(f"Loaded model {name} in {load_seconds:.2f}s")
+            return model
+
+    def warmup(self, names=None):
+        """Eagerly load the given (or all registered) models."""
+        for name in names or list(self._loaders):
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning(f"Failed to warm up model {name}: {str(e)}")
+
+    def unload(self, name: str) -> bool:
+        """Drop the shared instance so its memory can be reclaimed."""
+        with self._lock:
+            model = self._models.pop(name, None)
+            self._stats.pop(name, None)
+            hooks = list(self._unload_hooks.get(name, []))
+        if model is None:
+            return False
+        for hook in hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.warning(f"Unload hook for model {name} failed: {str(e)}")
+        del model
+        gc.collect()
+        logger.info(f"Unloaded model {name}")
+        return True
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def memory_usage(self):
+        """Per-model load time and memory footprint."""
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+class ModelProxy:
+    """Forwards attribute access to the registry's current instance of a model."""
+
+    def __init__(self, registry: ModelRegistry, name: str):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __repr__(self):
+        return f"ModelProxy({self._name!r})"
+
+
+def _parameter_bytes(model):
+    """Size of the torch parameters backing a model, if any can be found."""
+    # HuggingFaceEmbeddings wraps a SentenceTransformer in `client`
+    module = getattr(model, "client", model)
+    parameters = getattr(module, "parameters", None)
+    if not callable(parameters):
+        return None
+    try:
+        return sum(p.numel() * p.element_size() for p in parameters())
+    except Exception:
+        return None
+
+
+def _process_rss():
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except Exception:
+        return None
+
+
+registry = ModelRegistry()
@@ -1,11 +1,24 @@
 from dotenv import load_dotenv
-from groq import Groq
+from groq import Groq, AsyncGroq
 import cohere
 import os
 
 
 load_dotenv()
 
+# Generation settings shared by every completion; also part of the answer cache key
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3-70b-8192")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.5"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "1024"))
+LLM_TOP_P = float(os.getenv("LLM_TOP_P", "1"))
+
+LLM_PARAMS = {
+    "model": LLM_MODEL,
+    "temperature": LLM_TEMPERATURE,
+    "max_tokens": LLM_MAX_TOKENS,
+    "top_p": LLM_TOP_P,
+}
+
 
 client = Groq(
     api_key=os.getenv("GROQ_API_KEY"),
@@ -14,8 +27,19 @@ client = Groq(
 # init client
 co = cohere.Client(os.getenv("COHERE_API_KEY"))
 
+# Non-blocking clients for the async serving path
+async_client = AsyncGroq(
+    api_key=os.getenv("GROQ_API_KEY"),
+)
+async_co = cohere.AsyncClient(os.getenv("COHERE_API_KEY"))
+
 
-def llama_groq(query, prompt):
+def llama_groq(query, prompt, stream=False):
+    """Answer `query` under the system `prompt`.
+
+    With stream=True this returns a generator of content deltas as Groq
+    produces them instead of the full completion.
+    """
     chat_completion = client.chat.completions.create(
         #
         # Required parameters
@@ -36,7 +60,7 @@ def llama_groq(query, prompt):
             ],
 
             # The language model which will generate the completion.
-            model="llama3-70b-8192",
+            model=LLM_MODEL,
 
             #
             # Optional parameters
@@ -45,15 +69,15 @@ def llama_groq(query, prompt):
             # Controls randomness: lowering results in less random completions.
             # As the temperature approaches zero, the model will become deterministic
             # and repetitive.
-            temperature=0.5,
+            temperature=LLM_TEMPERATURE,
 
             # The maximum number of tokens to generate. Requests can use up to
             # 2048 tokens shared between prompt and completion.
-            max_tokens=1024,
+            max_tokens=LLM_MAX_TOKENS,
 
             # Controls diversity via nucleus sampling: 0.5 means half of all
             # likelihood-weighted options are considered.
-            top_p=1,
+            top_p=LLM_TOP_P,
 
             # A stop sequence is a predefined or user-specified text string that
             # signals an AI to stop generating content, ensuring its responses
@@ -62,14 +86,23 @@ def llama_groq(query, prompt):
             stop=None,
 
             # If set, partial message deltas will be sent.
-            stream=False,
+            stream=stream,
         )
 
+    if stream:
+        return _stream_deltas(chat_completion)
 
     response = chat_completion.choices[0].message.content
     return response
 
 
+def _stream_deltas(chat_completion):
+    for chunk in chat_completion:
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
 def llama_groq_structured(prompt):
     chat_completion = client.chat.completions.create(
         #
@@ -85,13 +118,13 @@ def llama_groq_structured(prompt):
                 },
             ],
 
-            model="llama3-70b-8192",
+            model=LLM_MODEL,
 
-            temperature=0.5,
+            temperature=LLM_TEMPERATURE,
 
-            max_tokens=1024,
+            max_tokens=LLM_MAX_TOKENS,
 
-            top_p=1,
+            top_p=LLM_TOP_P,
 
             stop=None,
 
@@ -109,4 +142,47 @@ def cohere_reranker(query, valid_chunks, top_k=3):
         top_n=top_k,
         model="rerank-english-v2.0"
     )
-    return rerank_docs
\ No newline at end of file
+    return rerank_docs
+
+
+async def llama_groq_async(query, prompt, stream=False):
+    """llama_groq() on the async Groq client; with stream=True returns an async generator of deltas."""
+    chat_completion = await async_client.chat.completions.create(
+        messages=[
+                {
+                    "role": "system",
+                    "content": prompt
+                },
+                {
+                    "role": "user",
+                    "content": query,
+                }
+            ],
+            model=LLM_MODEL,
+            temperature=LLM_TEMPERATURE,
+            max_tokens=LLM_MAX_TOKENS,
+            top_p=LLM_TOP_P,
+            stop=None,
+            stream=stream,
+        )
+
+    if stream:
+        return _stream_deltas_async(chat_completion)
+
+    return chat_completion.choices[0].message.content
+
+
+async def _stream_deltas_async(chat_completion):
+    async for chunk in chat_completion:
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+async def cohere_reranker_async(query, valid_chunks, top_k=3):
+    return await async_co.rerank(
+        query=query,
+        documents=valid_chunks,
+        top_n=top_k,
+        model="rerank-english-v2.0"
+    )
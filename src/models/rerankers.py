@@ -0,0 +1,228 @@
+from src.models.models import cohere_reranker, cohere_reranker_async
+from src.models.model_registry import registry
+from concurrent.futures import ThreadPoolExecutor
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Tuple
+import numpy as np
+import threading
+import hashlib
+import asyncio
+import re
+import os
+
+# "cohere" calls the Cohere API, "cross-encoder" scores locally on CPU
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "cohere")
+CROSS_ENCODER_MODEL = os.getenv("CROSS_ENCODER_MODEL", "BAAI/bge-reranker-base")
+CROSS_ENCODER_BATCH_SIZE = int(os.getenv("CROSS_ENCODER_BATCH_SIZE", "16"))
+CROSS_ENCODER_MAX_LENGTH = int(os.getenv("CROSS_ENCODER_MAX_LENGTH", "512"))
+# Directory holding an exported model.onnx (plus tokenizer files) to run with ONNX Runtime
+CROSS_ENCODER_ONNX_PATH = os.getenv("CROSS_ENCODER_ONNX_PATH")
+# (query, chunk) scores remembered across requests; 0 disables the cache
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "50000"))
+# Concurrent Cohere requests when a batch of queries is reranked
+COHERE_RERANK_CONCURRENCY = int(os.getenv("COHERE_RERANK_CONCURRENCY", "4"))
+
+
+class Reranker(ABC):
+    """Scores documents against a query; rerank() returns (document index, score), best first."""
+
+    @abstractmethod
+    def rerank(self, query: str, documents: List[str], top_k: int) -> List[Tuple[int, float]]:
+        ...
+
+    async def rerank_async(self, query: str, documents: List[str], top_k: int) -> List[Tuple[int, float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.rerank, query, documents, top_k)
+
+    def rerank_many(self, queries: List[str], documents_lists: List[List[str]], top_k: int) -> List[List[Tuple[int, float]]]:
+        """rerank() for several queries, each with its own documents, in one call."""
+        return [self.rerank(query, documents, top_k) for query, documents in zip(queries, documents_lists)]
+
+
+class CohereReranker(Reranker):
+    def rerank(self, query, documents, top_k):
+        response = cohere_reranker(query, documents, top_k)
+        return [(result.index, result.relevance_score) for result in response.results]
+
+    def rerank_many(self, queries, documents_lists, top_k):
+        # One API request per query; send them side by side
+        if len(queries) <= 1 or COHERE_RERANK_CONCURRENCY <= 1:
+            return super().rerank_many(queries, documents_lists, top_k)
+        with ThreadPoolExecutor(min(COHERE_RERANK_CONCURRENCY, len(queries))) as pool:
+            return list(pool.map(lambda args: self.rerank(*args, top_k), zip(queries, documents_lists)))
+
+    async def rerank_async(self, query, documents, top_k):
+        response = await cohere_reranker_async(query, documents, top_k)
+        return [(result.index, result.relevance_score) for result in response.results]
+
+
+class CrossEncoderReranker(Reranker):
+    """Local cross-encoder scoring (query, document) pairs in batches on CPU."""
+
+    def __init__(self, model_name: str = CROSS_ENCODER_MODEL, batch_size: int = CROSS_ENCODER_BATCH_SIZE,
+                 max_length: int = CROSS_ENCODER_MAX_LENGTH, onnx_path: str = CROSS_ENCODER_ONNX_PATH):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.onnx_path = onnx_path
+        self.registry_key = f"reranker:{onnx_path or model_name}"
+        registry.register(self.registry_key, self._load)
+
+    def _load(self):
+        if self.onnx_path:
+            import onnxruntime
+            from transformers import AutoTokenizer
+            session = onnxruntime.InferenceSession(
+                os.path.join(self.onnx_path, "model.onnx"), providers=["CPUExecutionProvider"]
+            )
+            return session, AutoTokenizer.from_pretrained(self.onnx_path)
+
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+
+    def score(self, query: str, documents: List[str]) -> np.ndarray:
+        return self.score_pairs([(query, document) for document in documents])
+
+    def score_pairs(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        model = registry.get(self.registry_key)
+        if not self.onnx_path:
+            return np.asarray(model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False))
+
+        session, tokenizer = model
+        input_names = {node.name for node in session.get_inputs()}
+        scores = []
+        for start in range(0, len(pairs), self.batch_size):
+            batch = pairs[start:start + self.batch_size]
+            features = tokenizer(
+                [q for q, _ in batch], [d for _, d in batch],
+                padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+            )
+            inputs = {name: value.astype(np.int64) for name, value in features.items() if name in input_names}
+            logits = session.run(None, inputs)[0]
+            scores.extend(logits[:, 0] if logits.ndim == 2 else logits)
+        return np.asarray(scores)
+
+    def rerank(self, query, documents, top_k):
+        scores = self.score(query, documents)
+        order = np.argsort(-scores)[:top_k]
+        return [(int(i), float(scores[i])) for i in order]
+
+    def rerank_many(self, queries, documents_lists, top_k):
+        # Every query's pairs go through the model together, filling whole batches
+        pairs = [(query, document) for query, documents in zip(queries, documents_lists) for document in documents]
+        scores = self.score_pairs(pairs) if pairs else np.asarray([])
+        rankings, start = [], 0
+        for documents in documents_lists:
+            query_scores = scores[start:start + len(documents)]
+            start += len(documents)
+            order = np.argsort(-query_scores)[:top_k]
+            rankings.append([(int(i), float(query_scores[i])) for i in order])
+        return rankings
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation don't change what is being asked."""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?.!").lower()
+
+
+def chunk_id(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class CachedReranker(Reranker):
+    """Remembers (query, chunk) scores so only chunks not yet scored for a query reach the backend.
+
+    Both backends score each pair independently, so cached and fresh scores can
+    be merged and ranked together.
+    """
+
+    def __init__(self, reranker: Reranker, name: str, max_entries: int = RERANK_CACHE_SIZE):
+        self.reranker = reranker
+        self.name = name
+        self.max_entries = max_entries
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, query, documents, doc_ids):
+        normalized = normalize_query(query)
+        doc_ids = doc_ids or [chunk_id(document) for document in documents]
+        keys = [(self.name, normalized, doc_id) for doc_id in doc_ids]
+        with self._lock:
+            scores = {}
+            for i, key in enumerate(keys):
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    scores[i] = self._scores[key]
+            self.hits += len(scores)
+            self.misses += len(keys) - len(scores)
+        missing = [i for i in range(len(documents)) if i not in scores]
+        return keys, scores, missing
+
+    def _merge(self, keys, scores, missing, ranking, top_k):
+        with self._lock:
+            for local_index, score in ranking:
+                index = missing[local_index]
+                scores[index] = score
+                self._scores[keys[index]] = score
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def rerank(self, query, documents, top_k, doc_ids=None):
+        keys, scores, missing = self._lookup(query, documents, doc_ids)
+        ranking = []
+        if missing:
+            # Score every missing chunk, not just the top_k, so all of them can be cached
+            ranking = self.reranker.rerank(query, [documents[i] for i in missing], len(missing))
+        return self._merge(keys, scores, missing, ranking, top_k)
+
+    async def rerank_async(self, query, documents, top_k, doc_ids=None):
+        keys, scores, missing = self._lookup(query, documents, doc_ids)
+        ranking = []
+        if missing:
+            ranking = await self.reranker.rerank_async(query, [documents[i] for i in missing], len(missing))
+        return self._merge(keys, scores, missing, ranking, top_k)
+
+    def rerank_many(self, queries, documents_lists, top_k, doc_ids_lists=None):
+        doc_ids_lists = doc_ids_lists or [None] * len(queries)
+        lookups = [
+            self._lookup(query, documents, doc_ids)
+            for query, documents, doc_ids in zip(queries, documents_lists, doc_ids_lists)
+        ]
+        todo = [i for i, (_, _, missing) in enumerate(lookups) if missing]
+        rankings = {}
+        if todo:
+            missing_documents = [[documents_lists[i][j] for j in lookups[i][2]] for i in todo]
+            fresh = self.reranker.rerank_many(
+                [queries[i] for i in todo], missing_documents, max(len(documents) for documents in missing_documents)
+            )
+            rankings = dict(zip(todo, fresh))
+        return [self._merge(*lookup, rankings.get(i, []), top_k) for i, lookup in enumerate(lookups)]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._scores), "hits": self.hits, "misses": self.misses}
+
+
+_rerankers = {}
+_rerankers_lock = threading.Lock()
+
+
+def get_reranker(backend: str = None) -> Reranker:
+    backend = backend or RERANKER_BACKEND
+    with _rerankers_lock:
+        if backend not in _rerankers:
+            if backend == "cohere":
+                reranker, name = CohereReranker(), "cohere:rerank-english-v2.0"
+            elif backend == "cross-encoder":
+                reranker = CrossEncoderReranker()
+                name = reranker.registry_key
+            else:
+                raise ValueError(f"Unknown reranker backend: {backend}")
+            if RERANK_CACHE_SIZE > 0:
+                reranker = CachedReranker(reranker, name)
+            _rerankers[backend] = reranker
+    return _rerankers[backend]
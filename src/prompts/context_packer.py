@@ -0,0 +1,110 @@
+from src.database.retrieval_types import RetrievedChunk
+from src.models.models import LLM_MAX_TOKENS
+from dataclasses import replace
+from typing import List
+import hashlib
+import os
+
+# llama3-70b-8192's window, shared by the prompt and the LLM_MAX_TOKENS completion
+LLM_CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", "8192"))
+# Upper bound on context tokens per prompt; the window left after the reserve caps it further
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# Shortest shared prefix/suffix treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 30
+
+# Older collections stored every chunk behind this line (see split_documents)
+LEGACY_CHUNK_PREAMBLE = "Below are chunks of a document that can be used to answer a question."
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text with the Llama 3 tokenizer
+    return len(text) // 4 + 1
+
+
+def context_budget(prompt_template: str, query: str) -> int:
+    """Context tokens that fit beside the template, the question and the completion reserve."""
+    available = LLM_CONTEXT_WINDOW - LLM_MAX_TOKENS - estimate_tokens(prompt_template) - estimate_tokens(query)
+    return max(0, min(CONTEXT_TOKEN_BUDGET, available))
+
+
+def chunk_body(text: str) -> str:
+    text = text.strip()
+    if text.startswith(LEGACY_CHUNK_PREAMBLE):
+        text = text[len(LEGACY_CHUNK_PREAMBLE):].strip()
+    return text
+
+
+def merge_overlap(first: str, second: str):
+    """`first` and `second` joined where one's end repeats the other's start, or None if unrelated."""
+    if second in first:
+        return first
+    if first in second:
+        return second
+    for a, b in ((first, second), (second, first)):
+        # Longest suffix of a that is also a prefix of b
+        for size in range(min(len(a), len(b)) - 1, MIN_OVERLAP_CHARS - 1, -1):
+            if a.endswith(b[:size]):
+                return a + b[size:]
+    return None
+
+
+def _same_document(a: RetrievedChunk, b: RetrievedChunk) -> bool:
+    return a.source == b.source and a.page == b.page
+
+
+def _best(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _merged(span: RetrievedChunk, chunk: RetrievedChunk, text: str) -> RetrievedChunk:
+    return replace(
+        span,
+        text=text,
+        vector_score=_best(span.vector_score, chunk.vector_score),
+        lexical_score=_best(span.lexical_score, chunk.lexical_score),
+        rerank_score=_best(span.rerank_score, chunk.rerank_score),
+    )
+
+
+def pack_context(chunks: List[RetrievedChunk], budget: int = CONTEXT_TOKEN_BUDGET) -> List[RetrievedChunk]:
+    """Fill `budget` tokens with chunks in the order given (best first).
+
+    A chunk overlapping an already packed neighbor from the same page is merged
+    into it and only costs its new text; chunks that no longer fit are skipped
+    so smaller, lower-ranked ones can still use the remaining budget.
+    """
+    spans = []
+    used = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            # Query caches persisted before chunks were structured hold plain strings
+            chunk = RetrievedChunk(chunk_id=hashlib.sha1(chunk.encode("utf-8")).hexdigest(), text=chunk)
+        chunk = replace(chunk, text=chunk_body(chunk.text))
+        if not chunk.text:
+            continue
+
+        for i, span in enumerate(spans):
+            text = merge_overlap(span.text, chunk.text) if _same_document(span, chunk) else None
+            if text is not None:
+                cost = estimate_tokens(text) - estimate_tokens(span.text)
+                if used + cost <= budget:
+                    spans[i] = _merged(span, chunk, text)
+                    used += cost
+                break
+        else:
+            cost = estimate_tokens(chunk.text)
+            if used + cost <= budget:
+                spans.append(chunk)
+                used += cost
+
+    # A chunk can bridge two spans packed before it; join those as well
+    packed = []
+    for span in spans:
+        for i, kept in enumerate(packed):
+            text = merge_overlap(kept.text, span.text) if _same_document(kept, span) else None
+            if text is not None:
+                packed[i] = _merged(kept, span, text)
+                break
+        else:
+            packed.append(span)
+    return packed
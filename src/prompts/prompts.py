@@ -1,3 +1,25 @@
+PROMPT_TEMPLATE = """
+Answer this question in a clear, unboring matter, based on the following context:
+{context}
+-----
+Answer this question based on the above context, without citing the context in your answer:
+{question};/
+Answer:
+"""
+
+INTERVIEW_QUESTIONS_PROMPT = """
+Generate 5 specific and detailed interview questions based on the candidate's resume information in the context.
+Focus on their skills, experience, education, and projects to create questions that an interviewer might actually ask them.
+Format the response as a numbered list of questions (1., 2., etc.).
+Make the questions challenging but fair, probing for detailed responses about their experience.
+Make sure to reference specific items from their resume instead of asking generic questions.
+-----
+Context from resume:
+{context}
+-----
+Generate 5 interview questions based on this resume:
+"""
+
 STRUCTURED_CV_RESUME_TEMPLATE = """
 You are an expert resume analyzer. Your task is to structure the following resume content into clear, comprehensive sections. Focus on extracting and organizing information into these key areas:
 - The name of the candidate
@@ -43,4 +65,4 @@ Additional Notes:
 - Note any potential gaps or areas for improvement.
 
 Remember to maintain a professional tone and focus on clarity and relevance in your structuring.
-"""
\ No newline at end of file
+"""
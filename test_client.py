@@ -2,6 +2,15 @@ import requests
 import sys
 import time
 
+def wait_for_job(job_id):
+    url = f'http://127.0.0.1:5000/jobs/{job_id}'
+    while True:
+        job = requests.get(url).json()
+        print(f"Job {job_id}: {job.get('stage')} ({job.get('progress')})")
+        if job.get('stage') in ('done', 'failed'):
+            return job
+        time.sleep(0.5)
+
 def upload_file(filepath):
     url = 'http://127.0.0.1:5000/upload'
     with open(filepath, 'rb') as f:
@@ -9,7 +18,14 @@ def upload_file(filepath):
         response = requests.post(url, files=files)
     print(f"Upload response: {response.status_code}")
     print(response.text)
-    return response.ok
+    if not response.ok:
+        return False
+    job_id = response.json().get('job_id')
+    if job_id is None:
+        # Identical file already processed; its collection is reused
+        return True
+    job = wait_for_job(job_id)
+    return job.get('stage') == 'done'
 
 def query_system(query_text):
     url = 'http://127.0.0.1:5000/query'
@@ -27,10 +43,17 @@ def test_multiple_queries():
         "What projects has the person worked on?"
     ]
     
-    for query in queries:
-        print(f"\n--- QUERY: {query} ---")
-        query_system(query)
-        time.sleep(1)  # Add a small delay between queries
+    # One request: repeats are answered once and the LLM calls run concurrently
+    url = 'http://127.0.0.1:5000/query/batch'
+    response = requests.post(url, json={'queries': queries})
+    print(f"Batch response: {response.status_code}")
+    if not response.ok:
+        print(response.text)
+        return False
+    for result in response.json()['results']:
+        print(f"\n--- QUERY: {result['query']} ---")
+        print(result.get('response') or f"Error: {result['error']}")
+    return True
 
 def main():
     if len(sys.argv) < 2: